@@ -0,0 +1,195 @@
+# agregados.py
+# Agregados por organização x instrumento x bloco, atualizados a cada
+# submissão. Guardam somas, contagens e soma dos quadrados das pontuações, de
+# modo que média, desvio padrão e número de respostas são lidos em O(1), sem
+# reler a planilha.
+#
+# Backfill (recalcula tudo a partir do armazenamento e das entradas pendentes
+# no spool, que fica no mesmo arquivo):
+#   python agregados.py spool_respostas.db --sqlite respostas.db
+#   python agregados.py spool_respostas.db --credenciais credenciais.json
+import argparse
+import math
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from instrumento import INSTRUMENTO_PADRAO
+
+# Posições das colunas nas linhas de `respostas_para_enviar`
+COL_TIMESTAMP, COL_ID_ORG, COL_RESPONDENTE, COL_BLOCO, COL_PONTUACAO, COL_INSTRUMENTO, COL_ID_ENVIO = 0, 1, 2, 5, 8, 9, 10
+
+
+def _valor_pontuacao(valor):
+    """Converte a pontuação da linha em float; N/A e valores inválidos viram None."""
+    if valor is None or valor == "N/A" or valor == "":
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _instrumento(linha):
+    """Chave do instrumento da linha; linhas antigas, sem a coluna, são do instrumento padrão."""
+    if len(linha) > COL_INSTRUMENTO and linha[COL_INSTRUMENTO]:
+        return linha[COL_INSTRUMENTO]
+    return INSTRUMENTO_PADRAO
+
+
+def _acumular(linhas):
+    """Agrupa as linhas por (id_organizacao, instrumento, bloco) -> [n, soma, soma_q, respondentes]."""
+    acumulado = {}
+    vistos = set()
+    for linha in linhas:
+        chave = (linha[COL_ID_ORG], _instrumento(linha), linha[COL_BLOCO])
+        acc = acumulado.setdefault(chave, [0, 0.0, 0.0, 0])
+        # Conta o respondente uma vez por bloco: pelo id_envio ou, em linhas antigas,
+        # por timestamp + nome
+        if len(linha) > COL_ID_ENVIO and linha[COL_ID_ENVIO]:
+            submissao = (linha[COL_ID_ENVIO],) + chave
+        else:
+            submissao = (linha[COL_TIMESTAMP], linha[COL_RESPONDENTE]) + chave
+        if submissao not in vistos:
+            vistos.add(submissao)
+            acc[3] += 1
+        valor = _valor_pontuacao(linha[COL_PONTUACAO])
+        if valor is not None:
+            acc[0] += 1
+            acc[1] += valor
+            acc[2] += valor * valor
+    return acumulado
+
+
+class AgregadosOrg:
+    """Armazena os agregados incrementais em SQLite."""
+
+    def __init__(self, caminho="spool_respostas.db"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS agregados_meta (chave TEXT PRIMARY KEY, valor TEXT)")
+        # Agregados anteriores à chave por instrumento: descarta e marca para backfill
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(agregados)")}
+        if colunas and "instrumento" not in colunas:
+            self._conn.execute("DROP TABLE agregados")
+            self._conn.execute("DELETE FROM agregados_meta WHERE chave = 'reconstruido_em'")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS agregados (
+                id_organizacao TEXT NOT NULL,
+                instrumento TEXT NOT NULL,
+                bloco TEXT NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                soma REAL NOT NULL DEFAULT 0,
+                soma_quadrados REAL NOT NULL DEFAULT 0,
+                respondentes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (id_organizacao, instrumento, bloco)
+            )
+        """)
+
+    def _somar(self, acumulado):
+        self._conn.executemany("""
+            INSERT INTO agregados (id_organizacao, instrumento, bloco, n, soma, soma_quadrados, respondentes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id_organizacao, instrumento, bloco) DO UPDATE SET
+                n = n + excluded.n,
+                soma = soma + excluded.soma,
+                soma_quadrados = soma_quadrados + excluded.soma_quadrados,
+                respondentes = respondentes + excluded.respondentes
+        """, [chave + tuple(valores) for chave, valores in acumulado.items()])
+
+    def registrar_linhas(self, linhas):
+        """Soma as linhas de uma submissão aos agregados."""
+        acumulado = _acumular(linhas)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._somar(acumulado)
+            self._conn.execute("COMMIT")
+
+    def reconstruir(self, linhas):
+        """Recalcula todos os agregados a partir das linhas brutas (backfill).
+
+        `linhas` pode ser um iterável grande, por exemplo o retorno de
+        `ws.get_all_values()` sem o cabeçalho.
+        """
+        acumulado = _acumular(linhas)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM agregados")
+            self._somar(acumulado)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO agregados_meta (chave, valor) VALUES ('reconstruido_em', ?)",
+                (datetime.now().isoformat(timespec="seconds"),),
+            )
+            self._conn.execute("COMMIT")
+
+    def reconstruir_do_backend(self, backend, spool=None):
+        """Backfill a partir de todas as linhas do backend e das ainda pendentes no `spool`.
+
+        Retorna o número de linhas lidas.
+        """
+        linhas = list(backend.ler_linhas_desde(0))
+        if spool is not None:
+            linhas += [linha for _, linhas_entrada in spool.pendentes() for linha in linhas_entrada]
+        self.reconstruir(linhas)
+        return len(linhas)
+
+    def precisa_reconstruir(self):
+        """Indica se os agregados nunca foram recalculados a partir do armazenamento.
+
+        Sem o backfill, só contêm as submissões recebidas por este arquivo de spool
+        (por exemplo, depois que a instância perdeu o disco).
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM agregados_meta WHERE chave = 'reconstruido_em'"
+            ).fetchone() is None
+
+    def ler(self, id_organizacao, instrumento=INSTRUMENTO_PADRAO):
+        """Retorna {bloco: {"n", "media", "desvio", "respondentes"}} da organização no instrumento."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT bloco, n, soma, soma_quadrados, respondentes FROM agregados "
+                "WHERE id_organizacao = ? AND instrumento = ?",
+                (id_organizacao, instrumento),
+            )
+            registros = cur.fetchall()
+        resultado = {}
+        for bloco, n, soma, soma_q, respondentes in registros:
+            media = soma / n if n else None
+            desvio = None
+            if n > 1:
+                # Desvio padrão amostral; max() evita raiz de negativo por arredondamento
+                desvio = math.sqrt(max(0.0, (soma_q - soma * soma / n) / (n - 1)))
+            resultado[bloco] = {"n": n, "media": media, "desvio": desvio, "respondentes": respondentes}
+        return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula os agregados por organização x instrumento x bloco (backfill).")
+    parser.add_argument("spool", help="arquivo SQLite do spool, onde ficam os agregados (SPOOL_CAMINHO)")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--sqlite", help="banco do BackendSQLite")
+    origem.add_argument("--credenciais", help="JSON da conta de serviço do Google (BackendSheets)")
+    parser.add_argument("--planilha", default="Respostas Formularios")
+    parser.add_argument("--aba", default="Fatores_Interpessoais")
+    args = parser.parse_args(argv)
+
+    from armazenamento import BackendSheets, BackendSQLite
+    from spool_local import SpoolLocal
+
+    if args.sqlite:
+        backend = BackendSQLite(args.sqlite)
+    else:
+        import gspread
+
+        gc = gspread.service_account(filename=args.credenciais)
+        backend = BackendSheets(gc.open(args.planilha).worksheet(args.aba))
+    total = AgregadosOrg(args.spool).reconstruir_do_backend(backend, SpoolLocal(args.spool))
+    print(f"Agregados recalculados a partir de {total} linhas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
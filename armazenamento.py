@@ -0,0 +1,322 @@
+# armazenamento.py
+# Backends de armazenamento das respostas. O envio (fila_envio.py) e os
+# relatórios (painel.py, agregados.py) passam por esta interface:
+#   - BackendSheets: aba "Fatores_Interpessoais" do Google Sheets (comportamento original)
+#   - BackendSheetsCompacto: uma linha por respondente (formato_compacto.py)
+#   - BackendSQLite: banco local indexado por organização, bloco e timestamp
+# As linhas seguem o layout de `respostas_para_enviar` (formato_compacto.COLUNAS_LONGAS):
+#   timestamp, id_organizacao, respondente, data, organizacao, Bloco, Item, Resposta, pontuacao, instrumento, id_envio
+#
+# Exportação do SQLite para a planilha (para clientes que querem a planilha):
+#   python armazenamento.py respostas.db credenciais.json
+import argparse
+import sqlite3
+import sys
+import threading
+
+from formato_compacto import (COL_ID_ENVIO, COLUNAS_LONGAS, N_FIXAS, cabecalho_compacto, compacto_para_longo,
+                              longo_para_compacto, tabela_instrumento)
+from instrumento import INSTRUMENTO_PADRAO
+
+COLUNAS = ("timestamp", "id_organizacao", "respondente", "data", "organizacao",
+           "bloco", "item", "resposta", "pontuacao", "instrumento", "id_envio")
+# Colunas acrescentadas depois da criação do banco (migração com ALTER TABLE)
+COLUNAS_MIGRADAS = {"instrumento": "TEXT", "id_envio": "TEXT"}
+
+
+class ConfiguracaoInvalida(Exception):
+    """A aba não corresponde ao formato configurado; as gravações ficam pendentes até a correção."""
+
+
+def letra_coluna(n):
+    """Letra da coluna de número `n` na planilha (1 = A, 27 = AA)."""
+    letras = ""
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(ord("A") + resto) + letras
+    return letras
+
+
+class BackendArmazenamento:
+    """Interface comum dos backends."""
+
+    nome = ""
+    # Linhas longas por registro físico (no formato compacto, uma linha guarda todos os itens)
+    linhas_por_registro = 1
+
+    def gravar_linhas(self, linhas):
+        """Grava as linhas de uma ou mais submissões."""
+        raise NotImplementedError
+
+    def ler_linhas_desde(self, n_linhas_lidas):
+        """Retorna as linhas gravadas depois das `n_linhas_lidas` primeiras (leitura incremental)."""
+        raise NotImplementedError
+
+    def envios_gravados(self, ids_envio):
+        """Quais dos `ids_envio` já estão gravados (usado depois de uma escrita incerta)."""
+        return set()
+
+
+class BackendSheets(BackendArmazenamento):
+    """Grava e lê a aba de respostas do Google Sheets."""
+
+    nome = "sheets"
+    # Coluna do id_envio na aba (1 = A)
+    coluna_id_envio = COL_ID_ENVIO + 1
+
+    def __init__(self, worksheet, linhas_cabecalho=1):
+        self.worksheet = worksheet
+        self.linhas_cabecalho = linhas_cabecalho
+        self._cabecalho_conferido = False
+
+    def cabecalho(self):
+        return list(COLUNAS_LONGAS)
+
+    def _garantir_cabecalho(self):
+        """Escreve na primeira linha da aba os nomes de coluna que faltam (uma vez por processo).
+
+        Só acrescenta à direita: nomes já existentes não são alterados.
+        """
+        if self._cabecalho_conferido or not self.linhas_cabecalho:
+            return
+        cabecalho = self.cabecalho()
+        atual = (self.worksheet.get(f"A1:{letra_coluna(len(cabecalho))}1") or [[]])[0]
+        if len(atual) < len(cabecalho):
+            self.worksheet.update(values=[cabecalho[len(atual):]], range_name=f"{letra_coluna(len(atual) + 1)}1")
+        self._cabecalho_conferido = True
+
+    def gravar_linhas(self, linhas):
+        self._garantir_cabecalho()
+        self.worksheet.append_rows(linhas, value_input_option='USER_ENTERED')
+
+    def ler_linhas_desde(self, n_linhas_lidas):
+        primeira = self.linhas_cabecalho + n_linhas_lidas + 1
+        return self.worksheet.get(f"A{primeira}:{letra_coluna(len(COLUNAS_LONGAS))}")
+
+    def envios_gravados(self, ids_envio):
+        letra = letra_coluna(self.coluna_id_envio)
+        coluna = self.worksheet.get(f"{letra}{self.linhas_cabecalho + 1}:{letra}")
+        return {valor for celulas in coluna for valor in celulas[:1]} & set(ids_envio)
+
+
+class BackendSheetsCompacto(BackendSheets):
+    """Grava no formato compacto: uma linha por respondente, itens como colunas.
+
+    A interface continua recebendo e devolvendo linhas no formato longo; a
+    conversão usa o instrumento para os IDs, blocos e itens reversos.
+    """
+
+    nome = "sheets_compacto"
+    coluna_id_envio = N_FIXAS + 1  # logo depois das colunas fixas
+
+    def __init__(self, worksheet, instrumento, linhas_cabecalho=1, worksheet_instrumento=None):
+        super().__init__(worksheet, linhas_cabecalho)
+        self.instrumento = instrumento
+        self.worksheet_instrumento = worksheet_instrumento
+        self.linhas_por_registro = len(instrumento.itens)
+
+    def cabecalho(self):
+        return cabecalho_compacto(self.instrumento)
+
+    def _garantir_cabecalho(self):
+        """Escreve o cabeçalho numa aba vazia e a tabela do instrumento na aba própria (uma vez por processo).
+
+        As colunas são os itens do instrumento: uma aba com outro cabeçalho
+        levanta ConfiguracaoInvalida em vez de receber respostas desalinhadas.
+        """
+        if self._cabecalho_conferido:
+            return
+        if self.linhas_cabecalho:
+            cabecalho = self.cabecalho()
+            atual = (self.worksheet.get(f"A1:{letra_coluna(len(cabecalho) + 1)}1") or [[]])[0]
+            if not atual:
+                self.worksheet.update(values=[cabecalho], range_name="A1")
+            elif atual != cabecalho:
+                raise ConfiguracaoInvalida(
+                    f"O cabeçalho da aba não é o do formato compacto de '{self.instrumento.nome}'.")
+        if self.worksheet_instrumento is not None:
+            self.worksheet_instrumento.update(values=tabela_instrumento(self.instrumento), range_name="A1")
+        self._cabecalho_conferido = True
+
+    def gravar_linhas(self, linhas):
+        compactas = longo_para_compacto(self.instrumento, linhas)
+        self._garantir_cabecalho()
+        self.worksheet.append_rows(compactas, value_input_option='USER_ENTERED')
+
+    def ler_linhas_desde(self, n_linhas_lidas):
+        # Cada linha compacta vira exatamente len(itens) linhas longas
+        n_itens = len(self.instrumento.itens)
+        primeira = self.linhas_cabecalho + n_linhas_lidas // n_itens + 1
+        ultima = letra_coluna(len(self.cabecalho()))
+        return compacto_para_longo(self.instrumento, self.worksheet.get(f"A{primeira}:{ultima}"))
+
+
+class BackendSQLite(BackendArmazenamento):
+    """Banco local com índices por organização/bloco e por timestamp."""
+
+    nome = "sqlite"
+
+    def __init__(self, caminho="respostas.db"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                id_organizacao TEXT NOT NULL,
+                respondente TEXT,
+                data TEXT,
+                organizacao TEXT,
+                bloco TEXT NOT NULL,
+                item TEXT NOT NULL,
+                resposta NUMERIC,
+                pontuacao INTEGER,
+                exportado INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Bancos criados antes da coluna instrumento
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(respostas)")}
+        for coluna, tipo in COLUNAS_MIGRADAS.items():
+            if coluna not in colunas:
+                self._conn.execute(f"ALTER TABLE respostas ADD COLUMN {coluna} {tipo}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_org_bloco ON respostas(id_organizacao, bloco)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_timestamp ON respostas(timestamp)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_nao_exportadas ON respostas(id) WHERE exportado = 0")
+
+    @staticmethod
+    def _para_banco(linha):
+        # Linhas antigas, sem as colunas finais, ficam com NULL nelas
+        linha = (list(linha) + [None] * len(COLUNAS))[:len(COLUNAS)]
+        # "N/A" vira NULL na pontuação para que médias no SQL ignorem o item
+        if linha[8] == "N/A":
+            linha[8] = None
+        return linha
+
+    @staticmethod
+    def _da_banco(registro):
+        linha = list(registro)
+        if linha[8] is None:
+            linha[8] = "N/A"
+        if linha[9] is None:
+            linha[9] = INSTRUMENTO_PADRAO
+        if linha[10] is None:
+            linha[10] = ""
+        return linha
+
+    def gravar_linhas(self, linhas):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO respostas ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})",
+                    [self._para_banco(linha) for linha in linhas],
+                )
+            except Exception:
+                # Sem o ROLLBACK a conexão fica presa na transação e toda gravação seguinte falha
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def ler_linhas_desde(self, n_linhas_lidas):
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT {', '.join(COLUNAS)} FROM respostas ORDER BY id LIMIT -1 OFFSET ?",
+                (n_linhas_lidas,),
+            )
+            return [self._da_banco(r) for r in cur.fetchall()]
+
+    def envios_gravados(self, ids_envio):
+        ids_envio = list(ids_envio)
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT DISTINCT id_envio FROM respostas WHERE id_envio IN ({', '.join('?' * len(ids_envio))})",
+                ids_envio,
+            )
+            return {id_envio for (id_envio,) in cur.fetchall()}
+
+    # --- EXPORTAÇÃO PARA O GOOGLE SHEETS ---
+    def exportar_para(self, destino, tamanho_lote=5000):
+        """Envia para `destino` (outro backend) as linhas ainda não exportadas, em lotes.
+
+        Cada lote fica marcado como "em envio" (exportado = 2) enquanto o destino grava e
+        só passa a exportado depois que o destino aceitou a gravação. Se uma execução
+        anterior falhou no meio de um lote (a gravação pode ter sido aplicada sem
+        resposta), os id_envio dele são conferidos no destino antes de reenviar.
+        Retorna o número de linhas exportadas.
+        """
+        total = self._conferir_em_envio(destino)
+        while True:
+            with self._lock:
+                registros = self._conn.execute(
+                    f"SELECT id, {', '.join(COLUNAS)} FROM respostas WHERE exportado = 0 ORDER BY id LIMIT ?",
+                    (tamanho_lote,),
+                ).fetchall()
+            if not registros:
+                return total
+            # Um lote cheio não termina no meio de uma submissão: a conferência é por id_envio
+            if len(registros) == tamanho_lote and registros[-1][-1]:
+                corte = len(registros)
+                while corte > 0 and registros[corte - 1][-1] == registros[-1][-1]:
+                    corte -= 1
+                registros = registros[:corte] or registros
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE respostas SET exportado = 2 WHERE exportado = 0 AND id BETWEEN ? AND ?",
+                    (registros[0][0], registros[-1][0]),
+                )
+            destino.gravar_linhas([self._da_banco(r[1:]) for r in registros])
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE respostas SET exportado = 1 WHERE exportado = 2 AND id BETWEEN ? AND ?",
+                    (registros[0][0], registros[-1][0]),
+                )
+            total += len(registros)
+
+    def _conferir_em_envio(self, destino):
+        """Resolve as linhas que ficaram "em envio" numa exportação interrompida.
+
+        As submissões cujo id_envio já está no destino são marcadas como exportadas;
+        as demais (inclusive linhas antigas, sem id_envio) voltam para a fila.
+        """
+        with self._lock:
+            ids = {id_envio for (id_envio,) in self._conn.execute(
+                "SELECT DISTINCT id_envio FROM respostas WHERE exportado = 2"
+            )}
+        if not ids:
+            return 0
+        presentes = destino.envios_gravados(ids - {None, ""})
+        with self._lock:
+            self._conn.execute("BEGIN")
+            confirmadas = self._conn.executemany(
+                "UPDATE respostas SET exportado = 1 WHERE exportado = 2 AND id_envio = ?",
+                [(id_envio,) for id_envio in presentes],
+            ).rowcount
+            self._conn.execute("UPDATE respostas SET exportado = 0 WHERE exportado = 2")
+            self._conn.execute("COMMIT")
+        if confirmadas:
+            print(f"{confirmadas} linhas de uma exportação interrompida já estavam no destino")
+        return max(confirmadas, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta as respostas do SQLite local para o Google Sheets.")
+    parser.add_argument("banco", help="arquivo SQLite do BackendSQLite")
+    parser.add_argument("credenciais", help="JSON da conta de serviço do Google")
+    parser.add_argument("--planilha", default="Respostas Formularios")
+    parser.add_argument("--aba", default="Fatores_Interpessoais")
+    parser.add_argument("--lote", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    import gspread
+
+    gc = gspread.service_account(filename=args.credenciais)
+    destino = BackendSheets(gc.open(args.planilha).worksheet(args.aba))
+    total = BackendSQLite(args.banco).exportar_para(destino, args.lote)
+    print(f"{total} linhas exportadas para '{args.aba}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# bench_app.py
+# Benchmark do questionário e do envio. Executa o app sem navegador com
+# streamlit.testing.v1.AppTest, trocando o gspread por uma planilha falsa em
+# memória, e simula N respondentes respondendo os 56 itens e enviando.
+#
+#   python benchmarks/bench_app.py --respondentes 20 --concorrencia 4
+#   python benchmarks/bench_app.py --comparar benchmarks/resultados/anterior.json
+#
+# O resultado (percentis de latência, memória por sessão e chamadas à API da
+# planilha por submissão) é gravado em JSON para comparar versões.
+#
+# O AppTest não executa fragmentos isoladamente: cada interação reexecuta o
+# script inteiro. O rerun_ms mede, portanto, o pior caso (rerun completo), e não
+# o rerun de fragmento que o navegador dispara ao marcar uma resposta.
+#
+# Os secrets e o runtime do AppTest são globais ao processo, então sessões
+# simultâneas rodam em processos separados: --concorrencia processos, cada um
+# com os seus respondentes em sequência, a sua planilha falsa e a sua fila de
+# envio. O agrupamento em lote entre sessões só acontece dentro de um processo.
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "inventario_fatores_interpessoais_app.py")
+BOTAO_ENVIAR = "Finalizar e Enviar Respostas"
+
+
+# --- PLANILHA FALSA ---
+class PlanilhaFalsa:
+    """Substitui o worksheet do gspread; guarda o cabeçalho e as linhas e conta as chamadas."""
+
+    def __init__(self, latencia_s=0.0):
+        self.latencia_s = latencia_s
+        self.cabecalho = []
+        self.linhas = []
+        self.chamadas = {}
+        self._lock = threading.Lock()
+
+    def _contar(self, metodo):
+        with self._lock:
+            self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+
+    def append_rows(self, linhas, value_input_option=None):
+        self._contar("append_rows")
+        with self._lock:
+            self.linhas.extend(list(linha) for linha in linhas)
+
+    def get(self, intervalo):
+        self._contar("get")
+        primeira = int("".join(c for c in intervalo.split(":")[0] if c.isdigit()))
+        with self._lock:
+            if primeira == 1:  # a linha 1 só é lida para conferir o cabeçalho
+                return [list(self.cabecalho)] if self.cabecalho else []
+            return [list(map(str, linha)) for linha in self.linhas[max(0, primeira - 2):]]
+
+    def update(self, values=None, range_name=None):
+        self._contar("update")
+        coluna = 0
+        for letra in "".join(c for c in range_name if c.isalpha()):
+            coluna = coluna * 26 + ord(letra) - ord("A") + 1
+        with self._lock:
+            self.cabecalho = self.cabecalho[:coluna - 1] + list(values[0])
+
+    def get_all_values(self):
+        self._contar("get_all_values")
+        with self._lock:
+            return [list(map(str, linha)) for linha in self.linhas]
+
+
+class ClienteFalso:
+    def __init__(self, planilha):
+        self.planilha = planilha
+
+    def open(self, nome):
+        return self
+
+    def worksheet(self, nome):
+        return self.planilha
+
+
+def instalar_planilha_falsa(planilha):
+    import gspread
+
+    gspread.service_account_from_dict = lambda *a, **k: ClienteFalso(planilha)
+
+
+# --- SIMULAÇÃO ---
+def percentis(valores):
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))] * 1000, 2)
+
+    return {"p50": p(0.50), "p90": p(0.90), "p99": p(0.99), "max": p(1.0),
+            "media": round(statistics.fmean(ordenados) * 1000, 2), "n": len(ordenados)}
+
+
+def novo_app(secrets, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    for chave, valor in secrets.items():
+        at.secrets[chave] = valor
+    return at
+
+
+def simular_respondente(n, secrets, timeout, semente):
+    """Abre uma sessão, responde todos os itens e envia. Retorna as latências."""
+    rnd = random.Random(semente + n)
+    at = novo_app(secrets, timeout)
+    inicio = time.perf_counter()
+    at.run()
+    reruns = [time.perf_counter() - inicio]
+
+    at.text_input(key="input_respondente").set_value(f"Respondente {n}")
+    # Cada run() reconstrói a árvore de elementos: o radio é buscado de novo a cada resposta
+    for i in range(len(at.radio)):
+        at.radio[i].set_value(rnd.choice(["N/A", 1, 2, 3, 4, 5, 5, 4]))
+        inicio = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - inicio)
+
+    botao = next(b for b in at.button if b.label == BOTAO_ENVIAR)
+    if botao.disabled:
+        # Garante o mínimo de 50% de respostas válidas
+        for i in range(len(at.radio)):
+            at.radio[i].set_value(3).run()
+        botao = next(b for b in at.button if b.label == BOTAO_ENVIAR)
+    botao.click()
+    inicio = time.perf_counter()
+    at.run()
+    envio = time.perf_counter() - inicio
+    erros = [str(e.value) for e in at.error]
+    return {"reruns": reruns, "envio": envio, "erros": erros, "sessao": at}
+
+
+def executar_processo(respondentes, latencia_api_s, timeout, semente):
+    """Simula os `respondentes` em sequência num processo próprio (planilha falsa e fila próprias)."""
+    os.chdir(RAIZ)  # o app abre o logo e o instrumento por caminho relativo
+    pasta = tempfile.mkdtemp(prefix="bench_inventario_")
+    planilha = PlanilhaFalsa(latencia_api_s)
+    instalar_planilha_falsa(planilha)
+    secrets = {
+        "google_credentials": {"private_key": "falsa"},
+        "LINK_SECRET_KEY": "benchmark",
+        "SPOOL_CAMINHO": os.path.join(pasta, "spool.db"),
+        "SNAPSHOT_CAMINHO": os.path.join(pasta, "snapshot.parquet"),
+        "FILA_INTERVALO_S": 0.5,
+    }
+
+    tracemalloc.start()
+    memoria_inicial = tracemalloc.get_traced_memory()[0]
+    # As sessões ficam vivas até a medição de memória
+    resultados = [simular_respondente(n, secrets, timeout, semente) for n in respondentes]
+    memoria_sessoes = tracemalloc.get_traced_memory()[0] - memoria_inicial
+    tracemalloc.stop()
+
+    # Espera a fila de envio gravar todas as linhas na planilha falsa
+    esperado = sum(1 for r in resultados if not r["erros"]) * 56
+    limite = time.monotonic() + 60
+    while len(planilha.linhas) < esperado and time.monotonic() < limite:
+        time.sleep(0.1)
+
+    return {
+        "resultados": [{chave: r[chave] for chave in ("reruns", "envio", "erros")} for r in resultados],
+        "memoria_sessoes": memoria_sessoes,
+        "linhas_gravadas": len(planilha.linhas),
+        "chamadas": dict(planilha.chamadas),
+    }
+
+
+def executar(respondentes, concorrencia, latencia_api_s, timeout, semente):
+    grupos = [list(range(i, respondentes, concorrencia)) for i in range(min(concorrencia, respondentes))]
+    inicio = time.perf_counter()
+    # spawn: cada processo cria o seu próprio runtime do Streamlit
+    with ProcessPoolExecutor(max_workers=len(grupos) or 1,
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        processos = list(executor.map(executar_processo, grupos, [latencia_api_s] * len(grupos),
+                                      [timeout] * len(grupos), [semente] * len(grupos)))
+    duracao = time.perf_counter() - inicio
+
+    resultados = [r for p in processos for r in p["resultados"]]
+    chamadas = {}
+    for p in processos:
+        for metodo, n in p["chamadas"].items():
+            chamadas[metodo] = chamadas.get(metodo, 0) + n
+    enviados = max(1, respondentes)
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "versao": _versao(),
+        "parametros": {"respondentes": respondentes, "concorrencia": concorrencia,
+                       "latencia_api_s": latencia_api_s},
+        "observacao": "AppTest reexecuta o script inteiro a cada interação (não roda fragmentos "
+                      "isolados); rerun_ms é o rerun completo. Sessões simultâneas rodam em processos "
+                      "separados, cada um com a sua fila de envio.",
+        "duracao_s": round(duracao, 3),
+        "rerun_ms": percentis([t for r in resultados for t in r["reruns"]]),
+        "envio_ms": percentis([r["envio"] for r in resultados]),
+        "memoria_por_sessao_kb": round(sum(p["memoria_sessoes"] for p in processos) / enviados / 1024, 1),
+        "linhas_gravadas": sum(p["linhas_gravadas"] for p in processos),
+        "chamadas_api": chamadas,
+        "chamadas_api_por_submissao": {metodo: round(n / enviados, 3) for metodo, n in chamadas.items()},
+        "erros": sorted({e for r in resultados for e in r["erros"]}),
+    }
+
+
+def _versao():
+    try:
+        return subprocess.run(["git", "-C", RAIZ, "describe", "--always", "--dirty"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def comparar(atual, anterior):
+    """Imprime a variação dos principais indicadores em relação a um resultado anterior."""
+    print(f"\nComparação com {anterior.get('versao')} ({anterior.get('data')}):")
+    for grupo in ("rerun_ms", "envio_ms"):
+        for chave in ("p50", "p90", "p99"):
+            a, b = atual[grupo].get(chave), anterior.get(grupo, {}).get(chave)
+            if a is not None and b:
+                print(f"  {grupo}.{chave}: {b} -> {a} ({(a - b) / b:+.1%})")
+    a, b = atual["memoria_por_sessao_kb"], anterior.get("memoria_por_sessao_kb")
+    if b:
+        print(f"  memoria_por_sessao_kb: {b} -> {a} ({(a - b) / b:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do questionário e do envio.")
+    parser.add_argument("--respondentes", type=int, default=20)
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument("--latencia-api", type=float, default=0.2, help="latência simulada por chamada à planilha (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="timeout de cada execução do script (s)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON do resultado (padrão: benchmarks/resultados/<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.respondentes, args.concorrencia, args.latencia_api, args.timeout, args.semente)
+
+    saida = args.saida or os.path.join(
+        RAIZ, "benchmarks", "resultados", f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
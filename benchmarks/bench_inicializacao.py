@@ -0,0 +1,194 @@
+# bench_inicializacao.py
+# Benchmark da partida a frio. Cada medição roda num interpretador novo (como
+# no primeiro acesso depois que a instância dorme): importa o streamlit, executa
+# a primeira renderização do app com AppTest e informa quanto tempo levou e
+# quais módulos pesados (pandas, numpy, gspread) foram carregados.
+#
+#   python benchmarks/bench_inicializacao.py --repeticoes 5
+#   python benchmarks/bench_inicializacao.py --comparar benchmarks/resultados/inicializacao-anterior.json
+#   python benchmarks/bench_inicializacao.py --revisao 4163920   # mede outra versão do app
+#
+# Cenários: link válido (questionário), link adulterado e acesso sem parâmetros.
+# No questionário, numpy e gspread podem aparecer como carregados: o app os
+# importa numa thread depois da primeira renderização, fora do tempo medido.
+#
+# Como no bench_app.py, o gspread usa a planilha falsa em memória: versões que
+# conectam na partida não falham com as credenciais falsas. A troca é feita
+# quando o app importa o gspread, para não alterar os módulos carregados.
+# Com --revisao, o app é lido de um git worktree temporário da revisão pedida.
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVO_APP = "inventario_fatores_interpessoais_app.py"
+MODULOS_PESADOS = ("pandas", "numpy", "gspread", "google.auth", "pyarrow")
+SEGREDO = "benchmark"
+
+# Executado no interpretador filho; recebe os parâmetros em JSON pela linha de comando
+_FILHO = r"""
+import importlib.abc, importlib.util, json, os, sys, time
+params = json.loads(sys.argv[1])
+os.chdir(params["raiz"])
+
+class GanchoGspread(importlib.abc.MetaPathFinder):
+    # Troca o cliente do gspread pela planilha falsa logo depois que o app o importar
+    def find_spec(self, nome, caminho, alvo=None):
+        if nome != "gspread":
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(nome)
+        executar = spec.loader.exec_module
+        def exec_module(modulo):
+            executar(modulo)
+            sys.path.insert(0, params["benchmarks"])
+            from bench_app import PlanilhaFalsa, instalar_planilha_falsa
+            instalar_planilha_falsa(PlanilhaFalsa())
+        spec.loader.exec_module = exec_module
+        return spec
+
+sys.meta_path.insert(0, GanchoGspread())
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+importacao = time.perf_counter() - inicio
+at = AppTest.from_file(params["app"], default_timeout=params["timeout"])
+for chave, valor in params["secrets"].items():
+    at.secrets[chave] = valor
+for chave, valor in params["query"].items():
+    at.query_params[chave] = valor
+inicio_run = time.perf_counter()
+at.run()
+primeira = time.perf_counter() - inicio_run
+print(json.dumps({
+    "importacao_streamlit_s": importacao,
+    "primeira_renderizacao_s": primeira,
+    "total_s": time.perf_counter() - inicio,
+    "modulos": {m: m in sys.modules for m in params["modulos"]},
+    "excecoes": [str(e.value) for e in at.exception],
+    "radios": len(at.radio),
+}))
+"""
+
+
+def _cenarios():
+    sys.path.insert(0, RAIZ)
+    from links import assinar
+
+    exp = "4102444800"  # 2100-01-01
+    return {
+        "questionario": {"org": "Benchmark", "exp": exp, "sig": assinar(SEGREDO, "Benchmark", exp)},
+        "link_adulterado": {"org": "Benchmark", "exp": exp, "sig": "0" * 16},
+        "sem_parametros": {},
+    }
+
+
+def medir(raiz, query, secrets, timeout):
+    params = {"raiz": raiz, "app": os.path.join(raiz, ARQUIVO_APP), "benchmarks": os.path.join(RAIZ, "benchmarks"),
+              "timeout": timeout, "secrets": secrets, "query": query, "modulos": list(MODULOS_PESADOS)}
+    saida = subprocess.run([sys.executable, "-c", _FILHO, json.dumps(params)],
+                           capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def executar(repeticoes, timeout, raiz=RAIZ, versao=None):
+    pasta = tempfile.mkdtemp(prefix="bench_inicializacao_")
+    secrets = {
+        # Credenciais falsas: a primeira renderização não deve tentar conectar
+        "google_credentials": {"private_key": "falsa"},
+        "LINK_SECRET_KEY": SEGREDO,
+        "SPOOL_CAMINHO": os.path.join(pasta, "spool.db"),
+        "SNAPSHOT_CAMINHO": os.path.join(pasta, "snapshot.parquet"),
+    }
+
+    resultado = {}
+    for nome, query in _cenarios().items():
+        medicoes = [medir(raiz, query, secrets, timeout) for _ in range(repeticoes)]
+        ultima = medicoes[-1]
+        resultado[nome] = {
+            "primeira_renderizacao_ms": round(statistics.median(
+                m["primeira_renderizacao_s"] for m in medicoes) * 1000, 1),
+            "total_ms": round(statistics.median(m["total_s"] for m in medicoes) * 1000, 1),
+            "importacao_streamlit_ms": round(statistics.median(
+                m["importacao_streamlit_s"] for m in medicoes) * 1000, 1),
+            "modulos_carregados": sorted(m for m, carregado in ultima["modulos"].items() if carregado),
+            "radios": ultima["radios"],
+            "excecoes": ultima["excecoes"],
+        }
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "versao": versao or _versao(),
+        "parametros": {"repeticoes": repeticoes, "planilha_falsa": True},
+        "cenarios": resultado,
+    }
+
+
+def _versao():
+    try:
+        return subprocess.run(["git", "-C", RAIZ, "describe", "--always", "--dirty"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def executar_revisao(revisao, repeticoes, timeout):
+    """Mede o app de outra revisão do git, num worktree temporário."""
+    versao = subprocess.run(["git", "-C", RAIZ, "rev-parse", "--short", revisao],
+                            capture_output=True, text=True, check=True).stdout.strip()
+    pasta = tempfile.mkdtemp(prefix="bench_inicializacao_worktree_")
+    worktree = os.path.join(pasta, versao)
+    subprocess.run(["git", "-C", RAIZ, "worktree", "add", "--detach", worktree, revisao],
+                   capture_output=True, check=True)
+    try:
+        return executar(repeticoes, timeout, worktree, versao)
+    finally:
+        subprocess.run(["git", "-C", RAIZ, "worktree", "remove", "--force", worktree], capture_output=True)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def comparar(atual, anterior):
+    """Imprime a variação da primeira renderização em relação a um resultado anterior."""
+    print(f"\nComparação com {anterior.get('versao')} ({anterior.get('data')}):")
+    for nome, dados in atual["cenarios"].items():
+        for chave in ("primeira_renderizacao_ms", "total_ms"):
+            a, b = dados[chave], anterior.get("cenarios", {}).get(nome, {}).get(chave)
+            if b:
+                print(f"  {nome}.{chave}: {b} -> {a} ({(a - b) / b:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da partida a frio do app.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="interpretadores novos por cenário")
+    parser.add_argument("--timeout", type=float, default=60.0, help="timeout da primeira execução (s)")
+    parser.add_argument("--saida", help="arquivo JSON do resultado "
+                                        "(padrão: benchmarks/resultados/inicializacao-<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--revisao", help="revisão do git a medir, em vez da árvore de trabalho")
+    args = parser.parse_args(argv)
+
+    if args.revisao:
+        resultado = executar_revisao(args.revisao, args.repeticoes, args.timeout)
+    else:
+        resultado = executar(args.repeticoes, args.timeout)
+
+    saida = args.saida or os.path.join(
+        RAIZ, "benchmarks", "resultados", f"inicializacao-{resultado['versao']}.json")
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# cliente_sheets.py
+# Cliente compartilhado do Google Sheets: conexão preguiçosa (e refeita após
+# falha ou token inválido), limitação de taxa por balde de tokens dimensionado
+# pelas cotas por minuto de leitura/escrita e backoff exponencial em 429/5xx.
+# Com excesso de demanda as chamadas esperam na fila do balde em vez de falhar.
+#
+# append_rows não é idempotente: se a requisição pode ter sido aplicada (timeout
+# de leitura, conexão perdida depois do envio, 5xx), ela não é repetida aqui e
+# sobe como EscritaIncerta; quem grava confere no destino antes de reenviar.
+#
+# A conexão é criada por uma função `conectar()` que devolve o worksheet; para
+# testar contra um servidor HTTP falso basta passar uma função que devolva um
+# objeto com a mesma interface (append_rows, get, get_all_values, update).
+import random
+import threading
+import time
+
+from metricas import metricas
+
+
+def status_http(e):
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def erro_de_cota(e):
+    """Indica se a exceção é de cota (429) ou instabilidade (5xx) da API do Google."""
+    status = status_http(e)
+    return status == 429 or (status is not None and 500 <= status < 600)
+
+
+def falha_de_conexao(e):
+    """Erro de rede em que a requisição não chegou a ser enviada (conexão recusada, DNS, timeout de conexão)."""
+    try:
+        from requests.exceptions import ConnectionError, ConnectTimeout
+        from urllib3.exceptions import NewConnectionError
+    except ImportError:
+        return False
+    if isinstance(e, ConnectTimeout):
+        return True
+    if isinstance(e, ConnectionError) and e.args:
+        return isinstance(getattr(e.args[0], "reason", e.args[0]), NewConnectionError)
+    return False
+
+
+class FalhaConexao(Exception):
+    """Não foi possível abrir a aba (credenciais, permissão, planilha ou aba inexistente, rede)."""
+
+
+class EscritaIncerta(Exception):
+    """A escrita falhou depois de enviada e pode ter sido aplicada; não é repetida pelo cliente."""
+
+
+class BaldeTokens:
+    """Limitador de taxa: `por_minuto` fichas por minuto, com rajada de até `capacidade`."""
+
+    def __init__(self, por_minuto, capacidade=None):
+        self.taxa_s = por_minuto / 60.0
+        self.capacidade = float(capacidade or max(1.0, por_minuto / 6.0))
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        self.esperando = 0
+
+    def adquirir(self, timeout=None):
+        """Bloqueia até haver uma ficha. Retorna False se o `timeout` estourar."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self.esperando += 1
+        try:
+            while True:
+                with self._lock:
+                    agora = time.monotonic()
+                    self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa_s)
+                    self._ultimo = agora
+                    if self._fichas >= 1.0:
+                        self._fichas -= 1.0
+                        return True
+                    espera = (1.0 - self._fichas) / self.taxa_s
+                if limite is not None and agora + espera > limite:
+                    return False
+                time.sleep(espera)
+        finally:
+            with self._lock:
+                self.esperando -= 1
+
+
+class ClienteSheets:
+    """Worksheet resiliente, compartilhado pelo processo."""
+
+    def __init__(self, conectar, escritas_por_minuto=60, leituras_por_minuto=60,
+                 max_tentativas=5, backoff_base_s=1.0, backoff_max_s=32.0):
+        self._conectar = conectar
+        self.baldes = {
+            "escrita": BaldeTokens(escritas_por_minuto),
+            "leitura": BaldeTokens(leituras_por_minuto),
+        }
+        self.max_tentativas = max_tentativas
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+
+        self._lock = threading.Lock()
+        self._worksheet = None
+        self._saude = {"conectado": False, "ultimo_sucesso": None, "ultimo_erro": None,
+                       "falhas_consecutivas": 0, "conexoes": 0}
+
+    # --- CONEXÃO ---
+    def _obter_worksheet(self):
+        with self._lock:
+            if self._worksheet is None:
+                with metricas.medir("inventario_etapa_segundos", etapa="conexao"):
+                    try:
+                        self._worksheet = self._conectar()
+                    except Exception as e:
+                        raise FalhaConexao(f"Falha ao abrir a aba: {e!r}") from e
+                self._saude["conectado"] = True
+                self._saude["conexoes"] += 1
+            return self._worksheet
+
+    def _descartar_conexao(self):
+        with self._lock:
+            self._worksheet = None
+            self._saude["conectado"] = False
+
+    def _registrar(self, erro=None):
+        with self._lock:
+            if erro is None:
+                self._saude["ultimo_sucesso"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                self._saude["falhas_consecutivas"] = 0
+            else:
+                self._saude["ultimo_erro"] = f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {erro}"
+                self._saude["falhas_consecutivas"] += 1
+
+    def saude(self):
+        """Estado do cliente: conexão, último sucesso/erro e chamadas aguardando cota."""
+        with self._lock:
+            estado = dict(self._saude)
+        estado["aguardando_cota"] = {tipo: b.esperando for tipo, b in self.baldes.items()}
+        return estado
+
+    # --- EXECUÇÃO COM COTA E RETENTATIVA ---
+    def _executar(self, tipo, operacao, idempotente=True):
+        for tentativa in range(self.max_tentativas):
+            if tentativa:
+                metricas.incrementar("inventario_sheets_retentativas_total", tipo=tipo)
+            self.baldes[tipo].adquirir()
+            try:
+                resultado = operacao(self._obter_worksheet())
+                self._registrar()
+                return resultado
+            except Exception as e:
+                self._registrar(e)
+                conectado = self._worksheet is not None
+                status = status_http(e)
+                # 429 e 401 são recusados antes de aplicar; 5xx e erros de rede depois
+                # do envio podem ter gravado as linhas
+                incerta = not idempotente and conectado and (
+                    (status is not None and status >= 500)
+                    or (isinstance(e, OSError) and not falha_de_conexao(e)))
+                if status == 401 or isinstance(e, OSError):
+                    # Token expirado ou falha de rede: reconecta (o gspread renova as credenciais)
+                    self._descartar_conexao()
+                elif erro_de_cota(e):
+                    metricas.incrementar("inventario_erros_cota_total")
+                elif conectado:
+                    raise  # erro da própria chamada: repetir não resolve
+                if incerta:
+                    raise EscritaIncerta(f"Escrita possivelmente aplicada: {e}") from e
+                if tentativa == self.max_tentativas - 1:
+                    raise
+                espera = min(self.backoff_max_s, self.backoff_base_s * 2 ** tentativa)
+                time.sleep(espera + random.uniform(0, espera / 2))
+
+    # --- INTERFACE DO WORKSHEET ---
+    def append_rows(self, linhas, value_input_option='USER_ENTERED'):
+        return self._executar("escrita", lambda ws: ws.append_rows(linhas, value_input_option=value_input_option),
+                              idempotente=False)
+
+    def get(self, intervalo):
+        return self._executar("leitura", lambda ws: ws.get(intervalo))
+
+    def get_all_values(self):
+        return self._executar("leitura", lambda ws: ws.get_all_values())
+
+    def update(self, values=None, range_name=None):
+        return self._executar("escrita", lambda ws: ws.update(values=values, range_name=range_name))
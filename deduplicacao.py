@@ -0,0 +1,136 @@
+# deduplicacao.py
+# Deduplicação de submissões. Cada sessão do formulário recebe um id_envio
+# aleatório (uuid4) ao abrir: o duplo clique e a reexecução depois de um envio
+# lento reenviam o mesmo ID e são reconhecidos sem gravar de novo. Duas pessoas
+# que respondem igual, ou a mesma pessoa que responde de novo, geram IDs
+# diferentes e as duas submissões são gravadas.
+#
+# Limpeza dos dados já gravados (CSV exportado da aba, formato longo): remove
+# as cópias de um mesmo id_envio (gravações repetidas). Com --por-conteudo,
+# também remove submissões com mesmo respondente, data e respostas (heurística
+# para linhas antigas, sem id_envio; respondentes anônimos nunca são removidos):
+#   python deduplicacao.py respostas.csv respostas_sem_duplicatas.csv
+#   python deduplicacao.py respostas.csv respostas_sem_duplicatas.csv --por-conteudo
+import argparse
+import csv
+import hashlib
+import sys
+import threading
+import uuid
+from collections import Counter, OrderedDict
+
+from formato_compacto import COL_ID_ENVIO
+
+
+def novo_id_envio():
+    """ID da submissão, gerado uma vez por sessão do formulário."""
+    return uuid.uuid4().hex
+
+
+def chave_conteudo(id_organizacao, respondente, data, respostas):
+    """Hash do conteúdo da submissão (16 caracteres hexadecimais), para a limpeza --por-conteudo.
+
+    `respostas` é {texto do item: resposta}, como nas colunas Item e Resposta
+    das linhas gravadas.
+    """
+    partes = [id_organizacao, str(respondente).strip().upper(), str(data).strip()]
+    partes += [f"{item}={resposta}" for item, resposta in sorted(respostas.items())]
+    return hashlib.sha256("\x1f".join(map(str, partes)).encode("utf-8")).hexdigest()[:16]
+
+
+class LRUEnvios:
+    """Conjunto limitado, em memória, dos IDs de envio vistos mais recentemente."""
+
+    def __init__(self, capacidade=10000):
+        self.capacidade = capacidade
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contem(self, id_envio):
+        with self._lock:
+            if id_envio in self._ids:
+                self._ids.move_to_end(id_envio)
+                return True
+            return False
+
+    def adicionar(self, id_envio):
+        with self._lock:
+            self._ids[id_envio] = None
+            self._ids.move_to_end(id_envio)
+            if len(self._ids) > self.capacidade:
+                self._ids.popitem(last=False)
+
+
+# --- LIMPEZA OFFLINE ---
+def _id_linha(linha):
+    return linha[COL_ID_ENVIO] if len(linha) > COL_ID_ENVIO else ""
+
+
+def deduplicar_linhas(linhas, por_conteudo=False):
+    """Remove submissões repetidas de linhas no formato longo.
+
+    Cada submissão tem uma linha por item: uma segunda linha com o mesmo
+    (id_envio, Item) é cópia de uma gravação repetida e é removida. Com
+    `por_conteudo`, as submissões (agrupadas por id_envio ou, sem ele, por
+    timestamp, id_organizacao e respondente) com mesma organização, respondente
+    não vazio, data e respostas também são duplicatas, e só a primeira é mantida.
+    Retorna (linhas_mantidas, n_submissoes_removidas).
+    """
+    copias, mantidas = Counter(), []
+    for linha in linhas:
+        id_linha = _id_linha(linha)
+        if id_linha:
+            copias[id_linha, linha[6]] += 1
+            if copias[id_linha, linha[6]] > 1:
+                continue
+        mantidas.append(linha)
+    # Submissões removidas: cópias a mais de cada id_envio
+    maximo = {}
+    for (id_linha, _), n in copias.items():
+        maximo[id_linha] = max(maximo.get(id_linha, 0), n)
+    removidas = sum(n - 1 for n in maximo.values())
+    if not por_conteudo:
+        return mantidas, removidas
+
+    submissoes = OrderedDict()
+    for linha in mantidas:
+        submissoes.setdefault(_id_linha(linha) or tuple(linha[0:3]), []).append(linha)
+
+    vistos, mantidas = set(), []
+    for linhas_submissao in submissoes.values():
+        primeira = linhas_submissao[0]
+        if str(primeira[2]).strip():
+            respostas = {linha[6]: linha[7] for linha in linhas_submissao}
+            chave = chave_conteudo(primeira[1], primeira[2], primeira[3], respostas)
+            if chave in vistos:
+                removidas += 1
+                continue
+            vistos.add(chave)
+        mantidas.extend(linhas_submissao)
+    return mantidas, removidas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove submissões duplicadas de um CSV da aba de respostas.")
+    parser.add_argument("entrada", help="CSV exportado da aba (formato longo, com cabeçalho)")
+    parser.add_argument("saida", help="CSV sem duplicatas")
+    parser.add_argument("--por-conteudo", action="store_true",
+                        help="remove também submissões com mesmo respondente (não vazio), data e respostas")
+    args = parser.parse_args(argv)
+
+    with open(args.entrada, newline="", encoding="utf-8-sig") as f:
+        leitor = csv.reader(f)
+        cabecalho = next(leitor)
+        linhas = list(leitor)
+
+    mantidas, removidas = deduplicar_linhas(linhas, args.por_conteudo)
+    with open(args.saida, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(cabecalho)
+        escritor.writerows(mantidas)
+    print(f"{removidas} submissões duplicadas removidas ({len(linhas) - len(mantidas)} linhas).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
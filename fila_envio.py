@@ -0,0 +1,225 @@
+# fila_envio.py
+# Fila de envio compartilhada pelo processo: junta as respostas de todas as
+# sessões e grava em lote no armazenamento, numa thread em segundo plano.
+# As submissões ficam no spool local (spool_local.py) até serem confirmadas
+# pelo backend de armazenamento (armazenamento.py).
+import threading
+import time
+
+from armazenamento import ConfiguracaoInvalida
+from cliente_sheets import EscritaIncerta, FalhaConexao, erro_de_cota, status_http
+from deduplicacao import LRUEnvios
+from formato_compacto import COL_ID_ENVIO
+from metricas import metricas
+
+
+def erro_transitorio(e):
+    """Erro do destino, e não da entrada: a mesma gravação pode dar certo depois.
+
+    Cota, instabilidade, rede, credenciais, permissão (401/403), planilha ou aba
+    inexistente (404, falha ao conectar) e aba mal configurada.
+    """
+    return (erro_de_cota(e) or status_http(e) in (401, 403, 404)
+            or isinstance(e, (OSError, ConfiguracaoInvalida, EscritaIncerta, FalhaConexao)))
+
+
+def _id_envio(linhas):
+    """id_envio da entrada, lido da coluna das linhas (entradas antigas não têm)."""
+    return linhas[0][COL_ID_ENVIO] if linhas and len(linhas[0]) > COL_ID_ENVIO else None
+
+
+class FilaEnvio:
+    """Drena o spool local para o backend com uma única gravação em lote por janela.
+
+    O envio acontece quando há `max_linhas` pendentes ou quando a submissão mais
+    antiga espera há mais de `intervalo_s` segundos. As retentativas de cota e
+    rede ficam no cliente da planilha (cliente_sheets.py); se ainda assim o lote
+    falhar, as entradas seguem pendentes no spool e são reenviadas na próxima
+    janela, com espera crescente entre janelas sem envio. Entradas que ficaram
+    pendentes de uma execução anterior são reenviadas logo ao iniciar.
+
+    Depois de uma EscritaIncerta (o lote pode ter sido gravado), ou ao iniciar
+    com pendências de uma execução anterior, a próxima janela pergunta ao backend
+    quais id_envio já estão lá e só reenvia os demais.
+
+    Se o lote falhar com um erro que não é transitório (linha malformada, HTTP
+    400, defeito do backend), as entradas são enviadas uma a uma para isolar a
+    que falha. A falha só conta contra a entrada quando outras do mesmo lote são
+    gravadas; depois de `max_falhas` falhas assim ela vai para a quarentena do
+    spool e deixa de bloquear as submissões seguintes.
+    """
+
+    def __init__(self, backend, spool, max_linhas=500, intervalo_s=5.0,
+                 backoff_base_s=2.0, backoff_max_s=60.0, max_falhas=5):
+        self.backend = backend
+        self.spool = spool
+        self.max_linhas = max_linhas
+        self.intervalo_s = intervalo_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.max_falhas = max_falhas
+
+        self._envios_recentes = LRUEnvios()
+        self._cond = threading.Condition()
+        self._parar = False
+        self._linhas_pendentes = spool.contar_pendentes()
+        # O processo anterior pode ter caído entre a gravação e a confirmação no spool:
+        # a primeira janela confere no backend o que já foi gravado antes de reenviar
+        self._escrita_incerta = bool(self._linhas_pendentes)
+        # Pendências herdadas de uma execução anterior são enviadas sem esperar a janela
+        self._pendente_desde = 0.0 if self._linhas_pendentes else None
+        self._thread = threading.Thread(target=self._loop, name="fila-envio", daemon=True)
+        self._thread.start()
+
+    # --- API USADA PELO APP ---
+    def enfileirar(self, linhas, id_envio=None):
+        """Grava a submissão no spool (fsync local) e retorna imediatamente.
+
+        Retorna None se a submissão com este `id_envio` já tiver sido recebida;
+        nesse caso nada é gravado de novo.
+        """
+        if id_envio is not None and self._envios_recentes.contem(id_envio):
+            metricas.incrementar("inventario_submissoes_duplicadas_total")
+            return None
+        # O índice único do spool cobre envios fora da LRU e cliques simultâneos
+        id_entrada = self.spool.gravar(linhas, id_envio)
+        if id_envio is not None:
+            self._envios_recentes.adicionar(id_envio)
+        if id_entrada is None:
+            metricas.incrementar("inventario_submissoes_duplicadas_total")
+            return None
+        with self._cond:
+            self._linhas_pendentes += len(linhas)
+            if self._pendente_desde is None:
+                self._pendente_desde = time.monotonic()
+            self._cond.notify()
+        return id_entrada
+
+    def pendentes(self):
+        """Número de linhas aguardando envio."""
+        with self._cond:
+            return self._linhas_pendentes
+
+    def parar(self, timeout=30.0):
+        """Envia o que estiver pendente e encerra a thread."""
+        with self._cond:
+            self._parar = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    # --- THREAD DE ENVIO ---
+    def _pronto_para_enviar(self):
+        if not self._linhas_pendentes:
+            return False
+        if self._parar or self._linhas_pendentes >= self.max_linhas:
+            return True
+        return time.monotonic() - self._pendente_desde >= self.intervalo_s
+
+    def _loop(self):
+        janelas_sem_envio = 0
+        while True:
+            with self._cond:
+                while not self._pronto_para_enviar():
+                    if self._parar and not self._linhas_pendentes:
+                        return
+                    self._cond.wait(timeout=self.intervalo_s / 2)
+
+            lote = self.spool.pendentes(self.max_linhas)
+            if self._enviar_lote(lote):
+                janelas_sem_envio = 0
+                continue
+
+            # Nada foi gravado nesta janela: espera antes de tentar de novo (parar() interrompe)
+            janelas_sem_envio += 1
+            espera = min(self.backoff_max_s, self.backoff_base_s * 2 ** (janelas_sem_envio - 1))
+            with self._cond:
+                if self._parar:
+                    return
+                self._cond.wait(timeout=espera)
+                if self._parar:
+                    return
+
+    def _enviar_lote(self, lote):
+        """Envia o lote; retorna True se alguma entrada saiu da fila (gravada ou em quarentena)."""
+        saiu_alguma = False
+        if self._escrita_incerta:
+            gravadas = self._ja_gravadas(lote)
+            if gravadas is None:
+                return False
+            if gravadas:
+                self._retirar(gravadas, confirmar=True)
+                ids_gravadas = {id_entrada for id_entrada, _ in gravadas}
+                lote = [entrada for entrada in lote if entrada[0] not in ids_gravadas]
+                saiu_alguma = True
+            if not lote:
+                return True
+
+        erro = self._enviar([linha for _, linhas in lote for linha in linhas])
+        if erro is None:
+            self._retirar(lote, confirmar=True)
+            return True
+        if erro_transitorio(erro):
+            return saiu_alguma  # separar o lote só gastaria mais chamadas
+
+        # Erro não transitório: envia entrada por entrada para isolar a que falha
+        if len(lote) == 1:
+            return saiu_alguma
+        falhas, gravou_alguma = [], False
+        for entrada in lote:
+            erro = self._enviar(entrada[1])
+            if erro is None:
+                self._retirar([entrada], confirmar=True)
+                saiu_alguma = gravou_alguma = True
+            elif erro_transitorio(erro):
+                return saiu_alguma
+            else:
+                falhas.append((entrada, erro))
+
+        # Só conta a falha contra a entrada se outras do mesmo lote foram gravadas;
+        # se todas falharam, o problema é do destino e elas seguem pendentes
+        if not gravou_alguma:
+            return saiu_alguma
+        for entrada, erro in falhas:
+            if self.spool.registrar_falha(entrada[0], erro, self.max_falhas):
+                metricas.incrementar("inventario_envio_quarentena_total")
+                print(f"Entrada {entrada[0]} do spool em quarentena após {self.max_falhas} falhas: {erro}")
+                self._retirar([entrada], confirmar=False)
+                saiu_alguma = True
+        return saiu_alguma
+
+    def _retirar(self, entradas, confirmar):
+        """Tira as entradas da contagem de pendentes (confirmando-as no spool, se gravadas)."""
+        if confirmar:
+            self.spool.confirmar([id_entrada for id_entrada, _ in entradas])
+        n_linhas = sum(len(linhas) for _, linhas in entradas)
+        with self._cond:
+            self._linhas_pendentes = max(0, self._linhas_pendentes - n_linhas)
+            self._pendente_desde = time.monotonic() if self._linhas_pendentes else None
+
+    def _ja_gravadas(self, lote):
+        """Entradas do lote que o backend já tem; None se não foi possível conferir."""
+        ids = {_id_envio(linhas) for _, linhas in lote} - {None, ""}
+        try:
+            presentes = self.backend.envios_gravados(ids) if ids else set()
+        except Exception as e:
+            print(f"Falha ao conferir envios após escrita incerta: {e}")
+            return None
+        self._escrita_incerta = False
+        gravadas = [entrada for entrada in lote if _id_envio(entrada[1]) in presentes]
+        if gravadas:
+            metricas.incrementar("inventario_envio_ja_gravados_total", len(gravadas))
+        return gravadas
+
+    def _enviar(self, linhas):
+        """Grava as linhas numa única tentativa; retorna None em caso de sucesso ou a exceção."""
+        try:
+            with metricas.medir("inventario_gravacao_segundos", backend=self.backend.nome):
+                self.backend.gravar_linhas(linhas)
+        except Exception as e:
+            if isinstance(e, EscritaIncerta):
+                self._escrita_incerta = True
+            metricas.incrementar("inventario_envio_falhas_total")
+            print(f"Falha ao enviar lote de {len(linhas)} linhas: {e}")
+            return e
+        metricas.incrementar("inventario_linhas_gravadas_total", len(linhas))
+        return None
@@ -0,0 +1,155 @@
+# formato_compacto.py
+# Formato compacto (largo) das submissões: uma linha por respondente, com os
+# IDs dos itens (COM01 … LID08) como colunas e a resposta como inteiro pequeno
+# (0 = N/A). Bloco, texto do item e reverso ficam uma única vez na tabela do
+# instrumento; a pontuação é recalculada na leitura.
+#
+# Formato longo (original), uma linha por item:
+#   timestamp, id_organizacao, respondente, data, organizacao, Bloco, Item, Resposta, pontuacao, instrumento, id_envio
+# (linhas anteriores às colunas instrumento e id_envio têm só as 9 ou 10 primeiras)
+#
+# Formato compacto, uma linha por submissão:
+#   timestamp, id_organizacao, respondente, data, organizacao, id_envio, COM01, …, LID08
+#
+# Migração de dados históricos exportados em CSV:
+#   python formato_compacto.py para-compacto longo.csv compacto.csv
+#   python formato_compacto.py para-longo compacto.csv longo.csv
+import argparse
+import csv
+import sys
+
+from instrumento import ESCALA_MAX
+
+COLUNAS_FIXAS = ("timestamp", "id_organizacao", "respondente", "data", "organizacao")
+N_FIXAS = len(COLUNAS_FIXAS)
+COLUNAS_LONGAS = COLUNAS_FIXAS + ("Bloco", "Item", "Resposta", "pontuacao", "instrumento", "id_envio")
+COL_INSTRUMENTO, COL_ID_ENVIO = 9, 10
+COLUNAS_COMPACTAS = COLUNAS_FIXAS + ("id_envio",)
+N_COMPACTAS = len(COLUNAS_COMPACTAS)
+SEM_RESPOSTA = 0  # N/A ou item não respondido
+
+
+def cabecalho_compacto(instrumento):
+    return list(COLUNAS_COMPACTAS) + [item.id for item in instrumento.itens]
+
+
+def tabela_instrumento(instrumento):
+    """Linhas da tabela do instrumento (gravada uma vez, à parte das respostas)."""
+    return [["ID", "Bloco", "Item", "Reverso"]] + [
+        [item.id, item.bloco, item.texto, "SIM" if item.reverso else "NÃO"] for item in instrumento.itens
+    ]
+
+
+def _codificar(resposta):
+    try:
+        valor = int(resposta)
+    except (TypeError, ValueError):
+        return SEM_RESPOSTA
+    return valor if 1 <= valor <= ESCALA_MAX else SEM_RESPOSTA
+
+
+# --- LONGO -> COMPACTO ---
+def _coluna(linha, posicao):
+    return linha[posicao] if len(linha) > posicao and linha[posicao] else ""
+
+
+def longo_para_compacto(instrumento, linhas_longas):
+    """Agrupa as linhas longas por submissão (coluna id_envio).
+
+    Linhas antigas, sem id_envio, são agrupadas por (timestamp, organização,
+    respondente); um item repetido nessa chave inicia outra submissão. Itens sem
+    linha correspondente ficam como 0 (N/A). Levanta ValueError para itens ou
+    instrumentos que não são os deste formato, em vez de descartar respostas.
+    """
+    posicao = {item.texto: i for i, item in enumerate(instrumento.itens)}
+    n_itens = len(instrumento.itens)
+    submissoes = {}
+    compactas = []
+    for linha in linhas_longas:
+        chave_instrumento = _coluna(linha, COL_INSTRUMENTO)
+        if chave_instrumento and chave_instrumento != instrumento.nome:
+            raise ValueError(f"Linha do instrumento '{chave_instrumento}' no formato compacto de "
+                             f"'{instrumento.nome}'.")
+        pos = posicao.get(linha[6])
+        if pos is None:
+            raise ValueError(f"Item fora do instrumento '{instrumento.nome}': {linha[6]!r}.")
+
+        id_envio = _coluna(linha, COL_ID_ENVIO)
+        chave = id_envio or tuple(linha[0:3])
+        compacta = submissoes.get(chave)
+        if compacta is None or compacta[N_COMPACTAS + pos] is not None:
+            compacta = submissoes[chave] = list(linha[:N_FIXAS]) + [id_envio] + [None] * n_itens
+            compactas.append(compacta)
+        compacta[N_COMPACTAS + pos] = _codificar(linha[7])
+
+    for compacta in compactas:
+        compacta[N_COMPACTAS:] = [SEM_RESPOSTA if v is None else v for v in compacta[N_COMPACTAS:]]
+    return compactas
+
+
+# --- COMPACTO -> LONGO ---
+def compacto_para_longo(instrumento, linhas_compactas):
+    """Expande cada linha compacta nas linhas do formato longo, com pontuação.
+
+    As respostas viram uma matriz N x itens pontuada de uma vez pelo motor de
+    pontuacao.py (inversão dos reversos; N/A fica NaN).
+    """
+    import numpy as np
+
+    from pontuacao import IndiceItens, pontuar
+
+    indice = IndiceItens.de_instrumento(instrumento)
+    n_itens = len(indice)
+    respostas = np.array(
+        [[_codificar(v) for v in (list(c[N_COMPACTAS:]) + [SEM_RESPOSTA] * n_itens)[:n_itens]]
+         for c in linhas_compactas],
+        dtype=float,
+    ).reshape(len(linhas_compactas), n_itens)
+    respostas[respostas == SEM_RESPOSTA] = np.nan
+    pontos = pontuar(indice, respostas)
+
+    linhas = []
+    for compacta, vetor, pontos_linha in zip(linhas_compactas, respostas, pontos):
+        fixas = list(compacta[:N_FIXAS])
+        id_envio = compacta[N_FIXAS] if len(compacta) > N_FIXAS else ""
+        for item, resposta, pontuacao in zip(instrumento.itens, vetor, pontos_linha):
+            if np.isnan(resposta):
+                resposta, pontuacao = "N/A", "N/A"
+            else:
+                resposta, pontuacao = int(resposta), int(pontuacao)
+            linhas.append(fixas + [item.bloco, item.texto, resposta, pontuacao, instrumento.nome, id_envio])
+    return linhas
+
+
+def main(argv=None):
+    from instrumento import INSTRUMENTO_PADRAO, carregar_instrumento
+
+    parser = argparse.ArgumentParser(description="Converte respostas entre o formato longo e o compacto.")
+    parser.add_argument("direcao", choices=["para-compacto", "para-longo"])
+    parser.add_argument("entrada", help="CSV de entrada, com cabeçalho")
+    parser.add_argument("saida", help="CSV de saída")
+    parser.add_argument("--instrumento", default="Inventario_Fatores_Interpessoais_Likert.xlsx")
+    parser.add_argument("--chave", default=INSTRUMENTO_PADRAO, help="chave do instrumento gravada nas linhas longas")
+    args = parser.parse_args(argv)
+
+    instrumento = carregar_instrumento(args.instrumento, args.chave)
+    with open(args.entrada, newline="", encoding="utf-8-sig") as f:
+        linhas = list(csv.reader(f))[1:]
+
+    if args.direcao == "para-compacto":
+        cabecalho = cabecalho_compacto(instrumento)
+        convertidas = longo_para_compacto(instrumento, linhas)
+    else:
+        cabecalho = list(COLUNAS_LONGAS)
+        convertidas = compacto_para_longo(instrumento, linhas)
+
+    with open(args.saida, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(cabecalho)
+        escritor.writerows(convertidas)
+    print(f"{len(linhas)} linhas lidas, {len(convertidas)} linhas gravadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
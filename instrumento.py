@@ -0,0 +1,165 @@
+# instrumento.py
+# Carrega a definição do instrumento (banco de itens) a partir da planilha
+# Likert (.xlsx, aba "Dados") ou de um JSON equivalente, valida e compila numa
+# estrutura imutável. O resultado compilado fica em cache no disco, com chave
+# pelo hash do arquivo, para que a partida a frio não precise do openpyxl.
+import hashlib
+import json
+import os
+import pickle
+import zipfile
+from typing import NamedTuple
+
+# Chave do instrumento original; as linhas gravadas antes da coluna "instrumento" são dele
+INSTRUMENTO_PADRAO = "fatores_interpessoais"
+ESCALA_MAX = 5  # Likert 1–5: item reverso vale (ESCALA_MAX + 1) - resposta
+COLUNAS_OBRIGATORIAS = ("Bloco", "ID", "Item", "Reverso")
+VALORES_REVERSO = ("SIM", "NÃO")
+VERSAO_FORMATO = 2  # incrementar ao mudar a estrutura compilada (invalida o cache)
+
+
+class ItemInstrumento(NamedTuple):
+    ordem: int
+    bloco: str
+    dimensao: str
+    id: str
+    texto: str
+    reverso: bool
+
+
+class Instrumento(NamedTuple):
+    nome: str
+    hash_arquivo: str
+    itens: tuple            # tuple[ItemInstrumento, ...] na ordem de aplicação
+    blocos: tuple           # nomes dos blocos, na ordem em que aparecem
+    indices_por_bloco: tuple  # ((bloco, posições dos itens em `itens`), ...) na ordem de `blocos`
+
+
+class InstrumentoInvalido(ValueError):
+    """Erro de validação do arquivo do instrumento."""
+
+
+# --- LEITURA ---
+def _ler_xlsx(caminho, aba="Dados"):
+    import openpyxl  # só é necessário quando o cache compilado não existe
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        wb = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+        raise InstrumentoInvalido(f"{caminho}: não é uma planilha .xlsx válida ({e}).") from e
+    try:
+        if aba not in wb.sheetnames:
+            raise InstrumentoInvalido(f"{caminho}: aba '{aba}' não encontrada.")
+        linhas = wb[aba].iter_rows(values_only=True)
+        primeira = next(linhas, None)
+        if primeira is None:
+            raise InstrumentoInvalido(f"{caminho}: aba '{aba}' vazia.")
+        cabecalho = [str(c).strip() if c is not None else "" for c in primeira]
+        registros = []
+        for linha in linhas:
+            if all(v is None or str(v).strip() == "" for v in linha):
+                continue
+            registros.append(dict(zip(cabecalho, linha)))
+        return registros
+    finally:
+        wb.close()
+
+
+def _ler_json(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        try:
+            dados = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise InstrumentoInvalido(f"{caminho}: JSON inválido ({e}).") from e
+    if isinstance(dados, dict):
+        dados = dados.get("itens")
+    if not isinstance(dados, list) or not all(isinstance(reg, dict) for reg in dados):
+        raise InstrumentoInvalido(f"{caminho}: esperado uma lista de itens (ou {{\"itens\": [...]}}).")
+    return dados
+
+
+# --- VALIDAÇÃO E COMPILAÇÃO ---
+def compilar(nome, registros, hash_arquivo=""):
+    """Valida os registros lidos e monta o Instrumento."""
+    if not registros:
+        raise InstrumentoInvalido(f"{nome}: nenhum item encontrado.")
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in registros[0]]
+    if faltando:
+        raise InstrumentoInvalido(f"{nome}: colunas ausentes: {', '.join(faltando)}.")
+
+    itens, vistos = [], set()
+    for n, reg in enumerate(registros, start=1):
+        item_id = str(reg.get("ID") or "").strip()
+        bloco = str(reg.get("Bloco") or "").strip()
+        texto = str(reg.get("Item") or "").strip()
+        reverso = str(reg.get("Reverso") or "").strip().upper()
+        if not item_id or not bloco or not texto:
+            raise InstrumentoInvalido(f"{nome}: linha {n} sem ID, Bloco ou Item.")
+        if item_id in vistos:
+            raise InstrumentoInvalido(f"{nome}: ID duplicado: {item_id}.")
+        if reverso not in VALORES_REVERSO:
+            raise InstrumentoInvalido(f"{nome}: Reverso inválido em {item_id}: {reg.get('Reverso')!r} (use SIM ou NÃO).")
+        vistos.add(item_id)
+        ordem = reg.get("Ordem")
+        try:
+            ordem = int(ordem) if ordem not in (None, "") else n
+        except (TypeError, ValueError):
+            raise InstrumentoInvalido(f"{nome}: Ordem inválida em {item_id}: {ordem!r} (use um número inteiro).") from None
+        itens.append(ItemInstrumento(
+            ordem=ordem,
+            bloco=bloco,
+            dimensao=str(reg.get("Dimensão") or "").strip(),
+            id=item_id,
+            texto=texto,
+            reverso=reverso == "SIM",
+        ))
+
+    itens.sort(key=lambda item: item.ordem)
+    blocos = tuple(dict.fromkeys(item.bloco for item in itens))
+    # Pares em vez de dict: o instrumento é compartilhado entre sessões e não pode ser alterado
+    indices_por_bloco = tuple(
+        (bloco, tuple(i for i, item in enumerate(itens) if item.bloco == bloco)) for bloco in blocos
+    )
+    return Instrumento(nome, hash_arquivo, tuple(itens), blocos, indices_por_bloco)
+
+
+# --- CARGA COM CACHE EM DISCO ---
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def carregar_instrumento(caminho, nome=None, pasta_cache=".cache_instrumentos"):
+    """Carrega o instrumento do arquivo, usando a versão compilada em disco se existir."""
+    nome = nome or os.path.splitext(os.path.basename(caminho))[0]
+    hash_arquivo = _hash_arquivo(caminho)
+    arquivo_cache = os.path.join(pasta_cache, f"{hash_arquivo[:16]}_v{VERSAO_FORMATO}.pickle")
+
+    if os.path.exists(arquivo_cache):
+        try:
+            with open(arquivo_cache, "rb") as f:
+                instrumento = pickle.load(f)
+            if instrumento.hash_arquivo == hash_arquivo:
+                return instrumento._replace(nome=nome)
+        except Exception:
+            pass  # cache corrompido ou de outra versão: recompila
+
+    if caminho.lower().endswith(".json"):
+        registros = _ler_json(caminho)
+    else:
+        registros = _ler_xlsx(caminho)
+    instrumento = compilar(nome, registros, hash_arquivo)
+
+    try:
+        os.makedirs(pasta_cache, exist_ok=True)
+        tmp = arquivo_cache + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(instrumento, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, arquivo_cache)
+    except OSError as e:
+        print(f"Não foi possível gravar o cache do instrumento {nome}: {e}")
+    return instrumento
@@ -1,12 +1,21 @@
 # app_fatores_interpessoais_final.py
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-import gspread
-import urllib.parse
 import hmac
-import hashlib
-# import matplotlib.pyplot as plt # Removido
+import threading
+import time
+from datetime import datetime
+from cliente_sheets import ClienteSheets
+from armazenamento import BackendSheets, BackendSheetsCompacto, BackendSQLite
+from deduplicacao import novo_id_envio
+from fila_envio import FilaEnvio
+from spool_local import SpoolLocal
+from agregados import AgregadosOrg
+from metricas import metricas
+from links import (LINK_ADULTERADO, LINK_EXPIRADO, LINK_SEM_PARAMETROS, LINK_VALIDO,
+                   id_organizacao, verificar_link)
+from instrumento import INSTRUMENTO_PADRAO, InstrumentoInvalido, carregar_instrumento
+# pandas, numpy (pontuacao, painel) e gspread são importados só quando usados:
+# a primeira página (cabeçalho, link e questionário) não depende deles.
 
 # --- PALETA DE CORES E CONFIGURAÇÃO DA PÁGINA ---
 COLOR_PRIMARY = "#70D1C6"
@@ -18,6 +27,20 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- MÉTRICAS (TEMPO POR ETAPA DA EXECUÇÃO E DO ENVIO) ---
+@st.cache_resource
+def iniciar_exportacao_metricas():
+    """Grava as métricas do processo em texto Prometheus e/ou JSONL, se configurado."""
+    return metricas.iniciar_exportacao(
+        st.secrets.get("METRICAS_PROMETHEUS"),
+        st.secrets.get("METRICAS_JSONL"),
+        float(st.secrets.get("METRICAS_INTERVALO_S", 60.0)),
+    )
+
+iniciar_exportacao_metricas()
+metricas.incrementar("inventario_execucoes_total")
+_inicio_css = time.perf_counter()
+
 # --- CSS CUSTOMIZADO ---
 st.markdown(f"""
     <style>
@@ -26,11 +49,6 @@ st.markdown(f"""
             visibility: hidden; height: 0%; position: fixed;
         }}
         
-        /* Código que esconde o botão ping */
-        #autoclick-div {{
-            display: none !important; 
-        }}
-        
         footer {{ visibility: hidden; height: 0%; }}
         /* Estilos gerais */
         .stApp {{ background-color: {COLOR_BACKGROUND}; color: {COLOR_TEXT_DARK}; }}
@@ -88,28 +106,160 @@ st.markdown(f"""
         }}
     </style>
 """, unsafe_allow_html=True)
-# --- CONEXÃO COM GOOGLE SHEETS (COM CACHE) ---
+metricas.observar("inventario_etapa_segundos", time.perf_counter() - _inicio_css, etapa="css")
+# --- ITENS DO INVENTÁRIO (BACK-END) ---
+# Instrumentos disponíveis, escolhidos por ?instrumento=<chave>. Outras versões
+# podem ser registradas em st.secrets["INSTRUMENTOS"] (chave = caminho do .xlsx/.json).
+# A chave é gravada em cada linha, separando os resultados de instrumentos diferentes.
+INSTRUMENTOS = {INSTRUMENTO_PADRAO: "Inventario_Fatores_Interpessoais_Likert.xlsx"}
+INSTRUMENTOS.update(dict(st.secrets.get("INSTRUMENTOS", {})))
+
 @st.cache_resource
-def connect_to_gsheet():
-    """Conecta ao Google Sheets e retorna os objetos das abas."""
-    try:
-        creds_dict = dict(st.secrets["google_credentials"])
-        creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
-        
-        gc = gspread.service_account_from_dict(creds_dict)
-        spreadsheet = gc.open("Respostas Formularios")
-        
-        # Retorna apenas a aba de respostas
-        return spreadsheet.worksheet("Fatores_Interpessoais")
-    except Exception as e:
-        st.error(f"Erro ao conectar com o Google Sheets: {e}")
-        return None
+def obter_instrumento(chave):
+    """Instrumento compilado (validado e em cache no disco), uma vez por processo."""
+    return carregar_instrumento(INSTRUMENTOS[chave], chave)
+
+@st.cache_resource
+def carregar_indice_itens(chave):
+    """Índice NumPy dos itens, calculado uma vez por processo."""
+    from pontuacao import IndiceItens
 
-ws_respostas = connect_to_gsheet()
+    return IndiceItens.de_instrumento(obter_instrumento(chave))
+
+OPCOES_LIKERT = ("N/A", 1, 2, 3, 4, 5)
+
+@st.cache_resource
+def layout_questionario(chave):
+    """Layout imutável do formulário: ((bloco, prefixo, ((item_id, label), ...)), ...)."""
+    instrumento = obter_instrumento(chave)
+    layout = []
+    for bloco, indices in instrumento.indices_por_bloco:
+        itens = tuple(
+            (item.id, f'({item.id}) {item.texto}' + (' (R)' if item.reverso else ''))
+            for item in (instrumento.itens[i] for i in indices)
+        )
+        prefixo_bloco = itens[0][0][:3] if itens else bloco # Ajustado para 3 letras
+        layout.append((bloco, prefixo_bloco, itens))
+    return tuple(layout)
 
-if ws_respostas is None:
-    st.error("Não foi possível conectar à aba 'Fatores_Interpessoais' da planilha.")
+chave_instrumento = st.query_params.get("instrumento", INSTRUMENTO_PADRAO)
+if chave_instrumento not in INSTRUMENTOS:
+    st.error(f"Instrumento '{chave_instrumento}' não encontrado.")
     st.stop()
+try:
+    obter_instrumento(chave_instrumento)
+except (OSError, InstrumentoInvalido) as e:
+    st.error(f"Erro ao carregar o instrumento '{chave_instrumento}': {e}")
+    st.stop()
+
+
+# --- CONEXÃO COM GOOGLE SHEETS (COM CACHE) ---
+def abrir_aba(nome, credenciais, criar=False):
+    """Conecta ao Google Sheets e retorna a aba `nome` (criada se `criar` e ela não existir)."""
+    import gspread  # chamado pela thread da fila, no primeiro envio
+
+    if not credenciais:
+        raise KeyError("google_credentials não configurado em st.secrets")
+    creds_dict = dict(credenciais)
+    creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
+    
+    gc = gspread.service_account_from_dict(creds_dict)
+    spreadsheet = gc.open("Respostas Formularios")
+    
+    try:
+        return spreadsheet.worksheet(nome)
+    except gspread.WorksheetNotFound:
+        if not criar:
+            raise
+        return spreadsheet.add_worksheet(nome, rows=200, cols=10)
+
+@st.cache_resource
+def connect_to_gsheet(aba="Fatores_Interpessoais", criar=False):
+    """Cliente compartilhado de uma aba (por padrão, a de respostas).
+
+    A conexão é aberta sob demanda e refeita após falhas, então um erro
+    passageiro não fica em cache até o processo reiniciar. As credenciais são
+    lidas aqui, na execução do script: a thread da fila não tem acesso a st.secrets.
+    """
+    credenciais = dict(st.secrets.get("google_credentials", {}))
+    return ClienteSheets(
+        lambda: abrir_aba(aba, credenciais, criar),
+        escritas_por_minuto=int(st.secrets.get("SHEETS_ESCRITAS_POR_MINUTO", 60)),
+        leituras_por_minuto=int(st.secrets.get("SHEETS_LEITURAS_POR_MINUTO", 60)),
+    )
+
+# --- BACKEND DE ARMAZENAMENTO ---
+# "sheets" (padrão) grava direto na aba; "sqlite" grava num banco local indexado,
+# que pode ser exportado para a planilha com `python armazenamento.py`.
+# Com FORMATO_REGISTRO = "compacto", a aba recebe uma linha por respondente.
+TIPO_BACKEND = st.secrets.get("STORAGE_BACKEND", "sheets")
+
+@st.cache_resource
+def obter_backend_sqlite(caminho):
+    return BackendSQLite(caminho)
+
+if TIPO_BACKEND == "sqlite":
+    backend = obter_backend_sqlite(st.secrets.get("SQLITE_CAMINHO", "respostas.db"))
+else:
+    ws_respostas = connect_to_gsheet()
+    linhas_cabecalho = int(st.secrets.get("SHEETS_LINHAS_CABECALHO", 1))
+    if st.secrets.get("FORMATO_REGISTRO", "longo") == "compacto":
+        # Uma linha por respondente, com os itens do instrumento como colunas: só
+        # funciona com um único instrumento registrado
+        if len(INSTRUMENTOS) > 1:
+            st.error("O formato compacto aceita um único instrumento. Remova os demais de INSTRUMENTOS "
+                     "ou use FORMATO_REGISTRO = \"longo\".")
+            st.stop()
+        # O backend escreve o cabeçalho na aba vazia e a tabela do instrumento na aba própria
+        backend = BackendSheetsCompacto(
+            ws_respostas, obter_instrumento(INSTRUMENTO_PADRAO), linhas_cabecalho,
+            connect_to_gsheet(st.secrets.get("SHEETS_ABA_INSTRUMENTO", "Instrumento"), criar=True),
+        )
+    else:
+        backend = BackendSheets(ws_respostas, linhas_cabecalho)
+
+# --- PRÉ-CARREGAMENTO EM SEGUNDO PLANO ---
+@st.cache_resource
+def preaquecer_modulos():
+    """Importa numpy (pontuação) e o gspread numa thread, depois da primeira renderização.
+
+    Assim o primeiro envio não paga essas importações, e a primeira página
+    não espera por elas.
+    """
+    def importar():
+        inicio = time.perf_counter()
+        try:
+            import pontuacao  # noqa: F401
+            if TIPO_BACKEND != "sqlite":
+                import gspread  # noqa: F401
+        except ImportError as e:
+            print(f"Falha no pré-carregamento de módulos: {e}")
+        metricas.observar("inventario_etapa_segundos", time.perf_counter() - inicio, etapa="preaquecimento")
+
+    thread = threading.Thread(target=importar, name="preaquecer-modulos", daemon=True)
+    thread.start()
+    return thread
+
+# --- FILA DE ENVIO (COMPARTILHADA ENTRE AS SESSÕES) ---
+@st.cache_resource
+def obter_fila_envio():
+    """Cria uma única fila por processo, com thread de envio em segundo plano."""
+    spool = SpoolLocal(st.secrets.get("SPOOL_CAMINHO", "spool_respostas.db"))
+    return FilaEnvio(
+        backend,
+        spool,
+        max_linhas=int(st.secrets.get("FILA_MAX_LINHAS", 500)),
+        intervalo_s=float(st.secrets.get("FILA_INTERVALO_S", 5.0)),
+        max_falhas=int(st.secrets.get("FILA_MAX_FALHAS", 5)),
+    )
+
+@st.cache_resource
+def obter_agregados():
+    """Agregados por organização x instrumento x bloco, no mesmo arquivo SQLite do spool."""
+    return AgregadosOrg(st.secrets.get("SPOOL_CAMINHO", "spool_respostas.db"))
+
+fila_envio = obter_fila_envio()
+agregados_org = obter_agregados()
 
 
 # --- CABEÇALHO DA APLICAÇÃO ---
@@ -140,37 +290,36 @@ try:
     exp_from_url = query_params.get("exp") # Parâmetro de expiração
     sig_from_url = query_params.get("sig") # Parâmetro de assinatura
     
-    # 1. Verifica se todos os parâmetros de segurança existem
+    # 1. Só lê a chave secreta se todos os parâmetros de segurança existirem
+    secret_key = ""
     if org_encoded_from_url and exp_from_url and sig_from_url:
-        org_decoded = urllib.parse.unquote(org_encoded_from_url)
-        
-        # 2. Recalcula a assinatura (com base na org + exp)
-        secret_key = st.secrets["LINK_SECRET_KEY"].encode('utf-8')
-        message = f"{org_decoded}|{exp_from_url}".encode('utf-8')
-        calculated_sig = hmac.new(secret_key, message, hashlib.sha256).hexdigest()
-        
-        # 3. Compara as assinaturas
-        if hmac.compare_digest(calculated_sig, sig_from_url):
-            # Assinatura OK! Agora verifica a data de validade
-            timestamp_validade = int(exp_from_url)
-            timestamp_atual = int(datetime.now().timestamp())
-            
-            if timestamp_atual <= timestamp_validade:
-                # SUCESSO: Assinatura válida E dentro da data
-                link_valido = True
-                org_coletora_valida = org_decoded
-            else:
-                # FALHA: Link expirou
-                st.error("Link Expirado. Por favor, solicite um novo link.")
-        else:
-            # FALHA: Assinatura não bate, link adulterado
-            st.error("Link inválido ou adulterado.")
+        secret_key = st.secrets["LINK_SECRET_KEY"]
+
+    # 2. Recalcula a assinatura (org + exp), compara e verifica a validade.
+    #    O HMAC fica em cache na sessão; a validade é conferida a cada execução.
+    if 'links_verificados' not in st.session_state:
+        st.session_state.links_verificados = {}
+    with metricas.medir("inventario_etapa_segundos", etapa="link"):
+        status_link, org_decoded = verificar_link(
+            secret_key, org_encoded_from_url, exp_from_url, sig_from_url,
+            cache=st.session_state.links_verificados,
+        )
+
+    if status_link == LINK_VALIDO:
+        # SUCESSO: Assinatura válida E dentro da data
+        link_valido = True
+        org_coletora_valida = org_decoded
+    elif status_link == LINK_EXPIRADO:
+        # FALHA: Link expirou
+        st.error("Link Expirado. Por favor, solicite um novo link.")
+    elif status_link == LINK_ADULTERADO:
+        # FALHA: Assinatura não bate, link adulterado
+        st.error("Link inválido ou adulterado.")
+    elif status_link == LINK_SEM_PARAMETROS:
+        # Se nenhum parâmetro for passado (acesso direto), permite o uso com valor padrão
+        link_valido = True
     else:
-         # Se nenhum parâmetro for passado (acesso direto), permite o uso com valor padrão
-         if not (org_encoded_from_url or exp_from_url or sig_from_url):
-             link_valido = True
-         else:
-             st.error("Link inválido. Faltando parâmetros de segurança.")
+        st.error("Link inválido. Faltando parâmetros de segurança.")
 
 except KeyError:
      st.error("ERRO DE CONFIGURAÇÃO: O app não pôde verificar a segurança do link. Contate o administrador.")
@@ -179,6 +328,39 @@ except Exception as e:
     st.error(f"Erro ao processar o link: {e}")
     link_valido = False
 
+# --- MODO SAÚDE (ESTADO DA CONEXÃO COM A PLANILHA) ---
+# ?modo=saude&chave=<SAUDE_CHAVE>; sem o segredo configurado o modo fica desativado
+if st.query_params.get("modo") == "saude":
+    chave_saude = st.secrets.get("SAUDE_CHAVE", "")
+    if not chave_saude or not hmac.compare_digest(st.query_params.get("chave", "").encode(),
+                                                  str(chave_saude).encode()):
+        st.error("Acesso ao modo saúde bloqueado.")
+        st.stop()
+    st.json({
+        "backend": backend.nome,
+        "sheets": connect_to_gsheet().saude() if TIPO_BACKEND != "sqlite" else None,
+        "linhas_pendentes": fila_envio.pendentes(),
+        "entradas_em_quarentena": len(fila_envio.spool.quarentena()),
+    })
+    st.stop()
+
+# --- MODO PAINEL (RESULTADOS DA ORGANIZAÇÃO) ---
+# Só abre com link assinado válido: o filtro usa a org do link, nunca um parâmetro livre
+if st.query_params.get("modo") == "painel":
+    if not (link_valido and status_link == LINK_VALIDO):
+        st.error("Acesso ao painel bloqueado. Use o link assinado da sua organização.")
+        st.stop()
+    from painel import obter_snapshot, renderizar_painel
+
+    if agregados_org.precisa_reconstruir():
+        # Primeiro acesso com este spool: soma as respostas já gravadas (backfill)
+        with st.spinner("Calculando os resultados..."):
+            agregados_org.reconstruir_do_backend(backend, fila_envio.spool)
+    snapshot = obter_snapshot(st.secrets.get("SNAPSHOT_CAMINHO", "snapshot_respostas.parquet"))
+    renderizar_painel(snapshot, backend, agregados_org, id_organizacao(org_coletora_valida),
+                      org_coletora_valida, chave_instrumento, carregar_indice_itens(chave_instrumento))
+    st.stop()
+
 # Renderiza os campos de identificação
 with st.container(border=True):
     st.markdown("<h3 style='text-align: center;'>Identificação</h3>", unsafe_allow_html=True)
@@ -209,108 +391,63 @@ else:
         )
 
 
-    # --- LÓGICA DO QUESTIONÁRIO (BACK-END) ---
-    @st.cache_data
-    def carregar_itens():
-        data = [
-            ('Comunicação', 'COM01', 'As mensagens são claras e compreensíveis para todos.', 'NÃO'),
-            ('Comunicação', 'COM02', 'A equipe pratica escuta ativa nas interações.', 'NÃO'),
-            ('Comunicação', 'COM03', 'O feedback é frequente, respeitoso e construtivo.', 'NÃO'),
-            ('Comunicação', 'COM04', 'Informações relevantes são compartilhadas com transparência.', 'NÃO'),
-            ('Comunicação', 'COM05', 'Os canais de comunicação são acessíveis e bem utilizados.', 'NÃO'),
-            ('Comunicação', 'COM06', 'A comunicação entre áreas é fluida e colaborativa.', 'NÃO'),
-            ('Comunicação', 'COM07', 'As reuniões são objetivas, com pautas e registros.', 'NÃO'),
-            ('Comunicação', 'COM08', 'Ruídos, boatos e mal-entendidos atrapalham o trabalho.', 'SIM'),
-            ('Gestão de Conflitos', 'GC01', 'Conflitos são identificados e tratados logo no início.', 'NÃO'),
-            ('Gestão de Conflitos', 'GC02', 'Existem critérios/processos claros para mediar conflitos.', 'NÃO'),
-            ('Gestão de Conflitos', 'GC03', 'As partes são ouvidas de forma imparcial e respeitosa.', 'NÃO'),
-            ('Gestão de Conflitos', 'GC04', 'Busca-se soluções que considerem os interesses de todos.', 'NÃO'),
-            ('Gestão de Conflitos', 'GC05', 'É seguro discordar e expor pontos de vista diferentes.', 'NÃO'),
-            ('Gestão de Conflitos', 'GC06', 'A liderança intervém quando necessário, de modo justo.', 'NÃO'),
-            ('Gestão de Conflitos', 'GC07', 'Conflitos se arrastam por muito tempo sem solução.', 'SIM'),
-            ('Gestão de Conflitos', 'GC08', 'Discussões descambam para ataques pessoais.', 'SIM'),
-            ('Trabalho em Equipe', 'TE01', 'Há objetivos compartilhados e entendimento de prioridades.', 'NÃO'),
-            ('Trabalho em Equipe', 'TE02', 'Os membros cooperam e se apoiam nas entregas.', 'NÃO'),
-            ('Trabalho em Equipe', 'TE03', 'Há troca de conhecimentos e boas práticas.', 'NÃO'),
-            ('Trabalho em Equipe', 'TE04', 'Papéis e responsabilidades são claros para todos.', 'NÃO'),
-            ('Trabalho em Equipe', 'TE05', 'A equipe se organiza para ajudar nos picos de demanda.', 'NÃO'),
-            ('Trabalho em Equipe', 'TE06', 'Existe confiança mútua entre os membros.', 'NÃO'),
-            ('Trabalho em Equipe', 'TE07', 'Existem silos entre áreas ou equipes que dificultam o trabalho.', 'SIM'),
-            ('Trabalho em Equipe', 'TE08', 'Há competição desleal ou sabotagem entre colegas.', 'SIM'),
-            ('Respeito', 'RES01', 'As interações são cordiais e educadas.', 'NÃO'),
-            ('Respeito', 'RES02', 'Horários e compromissos são respeitados.', 'NÃO'),
-            ('Respeito', 'RES03', 'Contribuições são reconhecidas de forma justa.', 'NÃO'),
-            ('Respeito', 'RES04', 'Interrupções desrespeitosas acontecem com frequência.', 'SIM'),
-            ('Respeito', 'RES05', 'Há respeito pela diversidade de opiniões.', 'NÃO'),
-            ('Respeito', 'RES06', 'A privacidade e os limites pessoais são respeitados.', 'NÃO'),
-            ('Respeito', 'RES07', 'A comunicação não-violenta é incentivada e praticada.', 'NÃO'),
-            ('Respeito', 'RES08', 'Piadas ofensivas ou tom agressivo são tolerados.', 'SIM'),
-            ('Inclusão', 'INC01', 'Existem oportunidades iguais de participação e desenvolvimento.', 'NÃO'),
-            ('Inclusão', 'INC02', 'Há representatividade de pessoas diversas em decisões.', 'NÃO'),
-            ('Inclusão', 'INC03', 'Acessibilidade (linguagem, recursos) é considerada nas interações.', 'NÃO'),
-            ('Inclusão', 'INC04', 'Fazem-se adaptações razoáveis quando necessário.', 'NÃO'),
-            ('Inclusão', 'INC05', 'Políticas antidiscriminação são conhecidas e aplicadas.', 'NÃO'),
-            ('Inclusão', 'INC06', 'As pessoas sentem que pertencem ao grupo/equipe.', 'NÃO'),
-            ('Inclusão', 'INC07', 'Microagressões são toleradas ou minimizadas.', 'SIM'),
-            ('Inclusão', 'INC08', 'Vozes minoritárias são ignoradas em discussões/decisões.', 'SIM'),
-            ('Convicções e Valores', 'CONV01', 'Os valores organizacionais são claros e conhecidos.', 'NÃO'),
-            ('Convicções e Valores', 'CONV02', 'Há coerência entre discurso e prática no dia a dia.', 'NÃO'),
-            ('Convicções e Valores', 'CONV03', 'As decisões são tomadas com base em princípios éticos.', 'NÃO'),
-            ('Convicções e Valores', 'CONV04', 'Há segurança para manifestar convicções de forma respeitosa.', 'NÃO'),
-            ('Convicções e Valores', 'CONV05', 'Crenças diversas são respeitadas sem imposição.', 'NÃO'),
-            ('Convicções e Valores', 'CONV06', 'Conflitos de valores são evitados ou ignorados.', 'SIM'),
-            ('Convicções e Valores', 'CONV07', 'Práticas antiéticas são normalizadas no cotidiano.', 'SIM'),
-            ('Convicções e Valores', 'CONV08', 'Há incentivo a ações de responsabilidade social.', 'NÃO'),
-            ('Liderança', 'LID01', 'A liderança é acessível e presente no dia a dia.', 'NÃO'),
-            ('Liderança', 'LID02', 'Define e comunica prioridades com clareza.', 'NÃO'),
-            ('Liderança', 'LID03', 'Reconhece e dá feedback sobre o desempenho.', 'NÃO'),
-            ('Liderança', 'LID04', 'Estimula o desenvolvimento/mentoria da equipe.', 'NÃO'),
-            ('Liderança', 'LID05', 'Considera dados e escuta a equipe nas decisões.', 'NÃO'),
-            ('Liderança', 'LID06', 'Há microgerenciamento excessivo.', 'SIM'),
-            ('Liderança', 'LID07', 'Favoritismo influencia decisões e oportunidades.', 'SIM'),
-            ('Liderança', 'LID08', 'Promove colaboração entre áreas/equipes.', 'NÃO'),
-        ]
-        df = pd.DataFrame(data, columns=["Bloco", "ID", "Item", "Reverso"])
-        return df
-
     # --- INICIALIZAÇÃO E FORMULÁRIO DINÂMICO ---
-    df_itens = carregar_itens()
     if 'respostas' not in st.session_state:
         st.session_state.respostas = {}
+    # ID da submissão desta sessão: o duplo clique e a reexecução reenviam o mesmo ID
+    if 'id_envio' not in st.session_state:
+        st.session_state.id_envio = novo_id_envio()
 
     st.subheader("Questionário")
-    blocos = df_itens["Bloco"].unique().tolist()
+
+    def resposta_valida(resposta):
+        return resposta is not None and resposta != "N/A"
+
     def registrar_resposta(item_id, key):
-        st.session_state.respostas[item_id] = st.session_state[key]
+        # Mantém o contador de respostas válidas sem percorrer todas as respostas
+        anterior = st.session_state.respostas.get(item_id)
+        nova = st.session_state[key]
+        st.session_state.respostas[item_id] = nova
+        st.session_state.respostas_validas += resposta_valida(nova) - resposta_valida(anterior)
 
-    for bloco in blocos:
-        df_bloco = df_itens[df_itens["Bloco"] == bloco]
-        prefixo_bloco = df_bloco['ID'].iloc[0][:3] if not df_bloco.empty else bloco # Ajustado para 3 letras
-        
-        with st.expander(f"{prefixo_bloco}", expanded=(bloco == blocos[0])):
-            for _, row in df_bloco.iterrows():
-                item_id = row["ID"]
-                label = f'({item_id}) {row["Item"]}' + (' (R)' if row["Reverso"] == 'SIM' else '')
+    if 'respostas_validas' not in st.session_state:
+        st.session_state.respostas_validas = sum(map(resposta_valida, st.session_state.respostas.values()))
+
+    layout = layout_questionario(chave_instrumento)
+    total_perguntas = len(obter_instrumento(chave_instrumento).itens)
+    limite_respostas = total_perguntas / 2
+
+    @st.fragment
+    def renderizar_bloco(prefixo_bloco, itens, expandido, botao_liberado):
+        # Cada bloco é um fragmento: responder um item reexecuta só este bloco
+        with metricas.medir("inventario_etapa_segundos", etapa="bloco"), \
+                st.expander(prefixo_bloco, expanded=expandido):
+            for item_id, label in itens:
                 widget_key = f"radio_{item_id}"
                 st.radio(
-                    label, options=["N/A", 1, 2, 3, 4, 5],
+                    label, options=OPCOES_LIKERT,
                     horizontal=True, key=widget_key,
                     on_change=registrar_resposta, args=(item_id, widget_key)
                 )
+            # Só as respostas deste bloco: o fragmento é o único lugar em que elas mudam
+            validas_bloco = sum(resposta_valida(st.session_state.respostas.get(item_id)) for item_id, _ in itens)
+            st.caption(f"{validas_bloco}/{len(itens)} respostas válidas neste bloco")
+        # Reexecuta a página inteira só quando o botão de envio muda de estado
+        if (st.session_state.respostas_validas >= limite_respostas) != botao_liberado:
+            st.rerun()
+
     # --- VALIDAÇÃO E BOTÃO DE FINALIZAR  ---
-    # Calcula o número de respostas válidas (excluindo N/A)
-    respostas_validas_contadas = 0
-    if 'respostas' in st.session_state:
-        for resposta in st.session_state.respostas.values():
-            if resposta is not None and resposta != "N/A":
-                respostas_validas_contadas += 1
-
-    total_perguntas = len(df_itens)
-    limite_respostas = total_perguntas / 2
+    # Número de respostas válidas (excluindo N/A), mantido por registrar_resposta
+    respostas_validas_contadas = st.session_state.respostas_validas
 
     # Determina se o botão deve ser desabilitado
     botao_desabilitado = respostas_validas_contadas < limite_respostas
 
+    with metricas.medir("inventario_etapa_segundos", etapa="questionario"):
+        for i, (_, prefixo_bloco, itens) in enumerate(layout):
+            renderizar_bloco(prefixo_bloco, itens, i == 0, not botao_desabilitado)
+    preaquecer_modulos()
+
     # Exibe aviso se o botão estiver desabilitado
     if botao_desabilitado:
         st.warning(f"Responda 50% das perguntas (excluindo 'N/A') para habilitar o envio. ({respostas_validas_contadas}/{total_perguntas} válidas)")
@@ -319,64 +456,33 @@ else:
     if st.button("Finalizar e Enviar Respostas", type="primary", disabled=botao_desabilitado):
             st.subheader("Enviando Respostas...")
 
-            # --- LÓGICA DE CÁLCULO (mantida internamente) ---
-            respostas_list = []
-            for index, row in df_itens.iterrows():
-                item_id = row['ID']
-                resposta_usuario = st.session_state.respostas.get(item_id)
-                respostas_list.append({
-                    "Bloco": row["Bloco"], "Item": row["Item"],
-                    "Resposta": resposta_usuario, "Reverso": row["Reverso"]
-                })
-            dfr = pd.DataFrame(respostas_list)
-            # --- LÓGICA DE ENVIO PARA GOOGLE SHEETS ---
-            with st.spinner("Enviando dados para a planilha..."):
-                try:
-                    timestamp_str = datetime.now().isoformat(timespec="seconds")
-
-                    nome_limpo = organizacao_coletora.strip().upper()
-                    id_organizacao = hashlib.md5(nome_limpo.encode('utf-8')).hexdigest()[:8].upper()
-
-                    respostas_para_enviar = []
-                    
-                    for _, row in dfr.iterrows():
-
-                        resposta = row["Resposta"]
-                        pontuacao = "N/A" # Valor padrão se for N/A ou None
-                    
-                        if pd.notna(resposta) and resposta != "N/A":
-                            try:
-                                valor = int(resposta)
-                                if row["Reverso"] == "SIM":
-                                    pontuacao = 6 - valor # Inverte: 1->5, 2->4, etc.
-                                else:
-                                    pontuacao = valor # Normal
-                            except ValueError:
-                                pass
-
-
-                        respostas_para_enviar.append([
-                            timestamp_str,
-                            id_organizacao,
-                            respondente,
-                            data,
-                            org_coletora_valida,
-                            row["Bloco"],
-                            row["Item"],
-                            row["Resposta"] if pd.notna(row["Resposta"]) else "N/A",
-                            pontuacao
-                        ])
-                    
-                    ws_respostas.append_rows(respostas_para_enviar, value_input_option='USER_ENTERED')
-                    
-                    st.success("Suas respostas foram enviadas com sucesso!")
+            # --- LÓGICA DE ENVIO PARA GOOGLE SHEETS (VIA FILA) ---
+            try:
+                timestamp_str = datetime.now().isoformat(timespec="seconds")
+
+                id_org = id_organizacao(organizacao_coletora)
+
+                # Pontuação vetorizada (inversão dos reversos e N/A) pelo motor compartilhado
+                from pontuacao import linhas_para_planilha
+
+                respostas_para_enviar = linhas_para_planilha(
+                    carregar_indice_itens(chave_instrumento),
+                    st.session_state.respostas,
+                    [timestamp_str, id_org, respondente, data, org_coletora_valida],
+                    [chave_instrumento, st.session_state.id_envio],
+                )
+
+                # Grava no spool local; a planilha é atualizada em lote pela thread da fila
+                with metricas.medir("inventario_etapa_segundos", etapa="envio"):
+                    id_entrada = fila_envio.enfileirar(respostas_para_enviar, st.session_state.id_envio)
+                    if id_entrada is not None:
+                        agregados_org.registrar_linhas(respostas_para_enviar)
+
+                if id_entrada is None:
+                    st.info("Estas respostas já haviam sido recebidas. Nada foi enviado novamente.")
+                else:
+                    metricas.incrementar("inventario_submissoes_total", id_organizacao=id_org)
+                    st.success("Suas respostas foram recebidas com sucesso e serão registradas em instantes!")
                     st.balloons()
-                except Exception as e:
-                    st.error(f"Erro ao enviar dados para a planilha: {e}")
-
-# --- BOTÃO INVISÍVEL PARA PINGER (COM st.empty) ---
-with st.empty():
-    st.markdown('<div id="autoclick-div">', unsafe_allow_html=True) 
-    if st.button("Ping Button", key="autoclick_button"):
-        print("Ping button clicked by automation.")
-    st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+            except Exception as e:
+                st.error(f"Erro ao registrar as respostas: {e}")
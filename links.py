@@ -0,0 +1,152 @@
+# links.py
+# Links assinados do inventário: ?org=<nome>&exp=<timestamp>&sig=<hmac>
+# A assinatura é HMAC-SHA256 de "org|exp" com a LINK_SECRET_KEY.
+#
+# Geração em lote a partir de um CSV de organizações (coluna "organizacao"):
+#   LINK_SECRET_KEY=... python links.py organizacoes.csv --dias 30 --saida links.csv
+import argparse
+import csv
+import hashlib
+import hmac
+import os
+import sys
+import urllib.parse
+from datetime import datetime, timedelta
+
+# Resultados possíveis de verificar_link()
+LINK_VALIDO = "valido"
+LINK_SEM_PARAMETROS = "sem_parametros"  # acesso direto, sem org/exp/sig
+LINK_INCOMPLETO = "incompleto"
+LINK_ADULTERADO = "adulterado"
+LINK_EXPIRADO = "expirado"
+
+URL_BASE_PADRAO = "https://wedja-fatoresinterpesoais.streamlit.app/"
+MAX_VERIFICACOES_EM_CACHE = 32
+
+
+def _chave_bytes(secret_key):
+    return secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+
+
+def assinar(secret_key, org, exp):
+    """Calcula a assinatura do par (org, exp)."""
+    message = f"{org}|{exp}".encode('utf-8')
+    return hmac.new(_chave_bytes(secret_key), message, hashlib.sha256).hexdigest()
+
+
+def _verificar_assinatura(secret_key, org_encoded, exp, sig):
+    """Retorna a org decodificada se a assinatura bater, senão None."""
+    org_decoded = urllib.parse.unquote(org_encoded)
+    if hmac.compare_digest(assinar(secret_key, org_decoded, exp), sig):
+        return org_decoded
+    return None
+
+
+def _status_validade(org_decoded, exp, agora):
+    agora = int(datetime.now().timestamp()) if agora is None else agora
+    if agora > int(exp):
+        return LINK_EXPIRADO, org_decoded
+    return LINK_VALIDO, org_decoded
+
+
+def verificar_link(secret_key, org_encoded, exp, sig, agora=None, cache=None):
+    """Verifica os parâmetros do link e retorna (status, org_decodificada).
+
+    Com `cache` (um dict, p.ex. guardado no st.session_state), o resultado do
+    HMAC fica memorizado por (org, exp, sig); a validade é conferida a cada
+    chamada, então um link em cache continua expirando no horário certo.
+    """
+    if not (org_encoded or exp or sig):
+        return LINK_SEM_PARAMETROS, None
+    if not (org_encoded and exp and sig):
+        return LINK_INCOMPLETO, None
+
+    chave = (org_encoded, exp, sig)
+    if cache is not None and chave in cache:
+        org_decoded = cache[chave]
+    else:
+        org_decoded = _verificar_assinatura(secret_key, org_encoded, exp, sig)
+        if cache is not None:
+            if len(cache) >= MAX_VERIFICACOES_EM_CACHE:
+                cache.pop(next(iter(cache)))
+            cache[chave] = org_decoded
+
+    if org_decoded is None:
+        return LINK_ADULTERADO, None
+    return _status_validade(org_decoded, exp, agora)
+
+
+def id_organizacao(nome_organizacao):
+    """ID curto da organização (MD5 do nome normalizado, 8 caracteres)."""
+    nome_limpo = nome_organizacao.strip().upper()
+    return hashlib.md5(nome_limpo.encode('utf-8')).hexdigest()[:8].upper()
+
+
+# --- GERAÇÃO DE LINKS EM LOTE ---
+def gerar_links(secret_key, organizacoes, exp, url_base=URL_BASE_PADRAO, parametros_extras=None):
+    """Gera um link assinado por organização.
+
+    Retorna uma lista de dicts com organizacao, id_organizacao, exp, sig e link.
+    O HMAC com a chave é preparado uma vez e copiado para cada organização.
+    """
+    base = hmac.new(_chave_bytes(secret_key), digestmod=hashlib.sha256)
+    extras = dict(parametros_extras or {})
+    links = []
+    for org in organizacoes:
+        org = org.strip()
+        if not org:
+            continue
+        h = base.copy()
+        h.update(f"{org}|{exp}".encode('utf-8'))
+        sig = h.hexdigest()
+        query = urllib.parse.urlencode({"org": org, "exp": exp, "sig": sig, **extras})
+        links.append({
+            "organizacao": org,
+            "id_organizacao": id_organizacao(org),
+            "exp": exp,
+            "sig": sig,
+            "link": f"{url_base}?{query}",
+        })
+    return links
+
+
+def _ler_organizacoes(caminho, coluna):
+    with open(caminho, newline="", encoding="utf-8-sig") as f:
+        leitor = csv.DictReader(f)
+        if coluna not in (leitor.fieldnames or []):
+            raise SystemExit(f"Coluna '{coluna}' não encontrada em {caminho}.")
+        return [linha[coluna] for linha in leitor]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera links assinados do inventário em lote.")
+    parser.add_argument("csv", help="CSV com uma coluna de organizações")
+    parser.add_argument("--coluna", default="organizacao")
+    parser.add_argument("--dias", type=int, default=30, help="validade dos links, em dias")
+    parser.add_argument("--url", default=URL_BASE_PADRAO)
+    parser.add_argument("--instrumento", help="acrescenta ?instrumento=<chave> aos links")
+    parser.add_argument("--saida", help="CSV de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    secret_key = os.environ.get("LINK_SECRET_KEY")
+    if not secret_key:
+        raise SystemExit("Defina a variável de ambiente LINK_SECRET_KEY.")
+
+    exp = int((datetime.now() + timedelta(days=args.dias)).timestamp())
+    extras = {"instrumento": args.instrumento} if args.instrumento else None
+    links = gerar_links(secret_key, _ler_organizacoes(args.csv, args.coluna), exp, args.url, extras)
+
+    saida = open(args.saida, "w", newline="", encoding="utf-8") if args.saida else sys.stdout
+    try:
+        escritor = csv.DictWriter(saida, fieldnames=["organizacao", "id_organizacao", "exp", "sig", "link"])
+        escritor.writeheader()
+        escritor.writerows(links)
+    finally:
+        if args.saida:
+            saida.close()
+    print(f"{len(links)} links gerados.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
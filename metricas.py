@@ -0,0 +1,140 @@
+# metricas.py
+# Instrumentação leve do app: contadores e histogramas em memória, por
+# processo, exportados em formato texto do Prometheus e/ou JSONL.
+# Cada observação custa um perf_counter, um bisect e um lock curto, o que
+# permite deixar a coleta ligada em produção.
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites dos buckets (segundos), do 1 ms aos 30 s
+BUCKETS_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted(rotulos.items()))
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+class Metricas:
+    """Registro de contadores e histogramas do processo."""
+
+    def __init__(self, buckets=BUCKETS_PADRAO):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}  # chave -> [contagens por bucket..., +Inf], soma, n
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **rotulos):
+        chave = _chave(nome, rotulos)
+        pos = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            hist = self._histogramas.get(chave)
+            if hist is None:
+                hist = self._histogramas[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][pos] += 1
+            hist[1] += valor
+            hist[2] += 1
+
+    @contextmanager
+    def medir(self, nome, **rotulos):
+        """Mede a duração do bloco (também quando ele termina com exceção, p.ex. st.stop())."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    # --- EXPORTAÇÃO ---
+    def _copiar(self):
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {k: (list(h[0]), h[1], h[2]) for k, h in self._histogramas.items()}
+        return contadores, histogramas
+
+    def texto_prometheus(self):
+        """Formato de exposição em texto do Prometheus."""
+        contadores, histogramas = self._copiar()
+        linhas = []
+        for nome in sorted({n for n, _ in contadores}):
+            linhas.append(f"# TYPE {nome} counter")
+            for (n, rotulos), valor in sorted(contadores.items()):
+                if n == nome:
+                    linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor}")
+        for nome in sorted({n for n, _ in histogramas}):
+            linhas.append(f"# TYPE {nome} histogram")
+            for (n, rotulos), (contagens, soma, total) in sorted(histogramas.items()):
+                if n != nome:
+                    continue
+                acumulado = 0
+                for limite, contagem in zip(self.buckets + ("+Inf",), contagens):
+                    acumulado += contagem
+                    linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, [('le', limite)])} {acumulado}")
+                linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {soma}")
+                linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {total}")
+        return "\n".join(linhas) + "\n"
+
+    def instantaneo(self):
+        """Estado atual como dicionário serializável (uma linha do JSONL)."""
+        contadores, histogramas = self._copiar()
+        return {
+            "instante": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "contadores": [{"nome": n, "rotulos": dict(r), "valor": v} for (n, r), v in contadores.items()],
+            "histogramas": [
+                {"nome": n, "rotulos": dict(r), "buckets": list(self.buckets), "contagens": c,
+                 "soma": round(s, 6), "n": total}
+                for (n, r), (c, s, total) in histogramas.items()
+            ],
+        }
+
+    def exportar_prometheus(self, caminho):
+        tmp = caminho + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(tmp, caminho)
+
+    def exportar_jsonl(self, caminho):
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.instantaneo(), ensure_ascii=False) + "\n")
+
+    def iniciar_exportacao(self, caminho_prometheus=None, caminho_jsonl=None, intervalo_s=60.0):
+        """Thread que grava os arquivos de métricas a cada `intervalo_s` segundos."""
+        if not (caminho_prometheus or caminho_jsonl):
+            return None
+
+        def loop():
+            while True:
+                time.sleep(intervalo_s)
+                try:
+                    if caminho_prometheus:
+                        self.exportar_prometheus(caminho_prometheus)
+                    if caminho_jsonl:
+                        self.exportar_jsonl(caminho_jsonl)
+                except OSError as e:
+                    print(f"Falha ao exportar métricas: {e}")
+
+        thread = threading.Thread(target=loop, name="exportar-metricas", daemon=True)
+        thread.start()
+        return thread
+
+
+# Registro único do processo, compartilhado pelo app e pela fila de envio
+metricas = Metricas()
@@ -0,0 +1,169 @@
+# painel.py
+# Painel de resultados por organização (modo=painel). As médias por bloco vêm
+# dos agregados incrementais (agregados.py), lidos em O(1); os detalhes (itens
+# reversos, respondentes por dia) vêm de um snapshot colunar local (Parquet)
+# das respostas, atualizado de forma incremental: só as linhas depois da
+# última já sincronizada são buscadas no backend de armazenamento.
+# A última linha sincronizada é relida a cada sincronização e comparada com a
+# impressão guardada: se a planilha foi reescrita (deduplicação, exclusões,
+# troca de backend), o snapshot é refeito do zero.
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from formato_compacto import COLUNAS_LONGAS
+from instrumento import INSTRUMENTO_PADRAO
+
+COLUNAS = list(COLUNAS_LONGAS)
+COLUNAS_CATEGORICAS = ["id_organizacao", "organizacao", "Bloco", "Item", "instrumento"]
+VERSAO_SNAPSHOT = 3  # incrementar ao mudar as colunas (descarta snapshots antigos)
+
+
+def impressao_linha(linha):
+    """Hash curto de uma linha como lida do backend."""
+    return hashlib.sha256("\x1f".join(map(str, linha)).encode("utf-8")).hexdigest()[:16]
+
+
+class SnapshotRespostas:
+    """Cópia local (Parquet) das respostas, sincronizada incrementalmente."""
+
+    def __init__(self, caminho="snapshot_respostas.parquet", intervalo_min_s=60.0):
+        self.caminho = caminho
+        self.caminho_meta = caminho + ".json"
+        self.intervalo_min_s = intervalo_min_s
+        self._lock = threading.Lock()
+        self._ultima_sync = 0.0
+        self._zerar()
+        if os.path.exists(self.caminho) and os.path.exists(self.caminho_meta):
+            with open(self.caminho_meta, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("versao") == VERSAO_SNAPSHOT:
+                self.backend_sincronizado = meta["backend"]
+                self.impressao_ultima = meta["impressao_ultima"]
+                self.linhas_sincronizadas = meta["linhas_sincronizadas"]
+                self.df = pd.read_parquet(self.caminho)
+
+    def _zerar(self):
+        self.backend_sincronizado = None
+        self.impressao_ultima = None
+        self.linhas_sincronizadas = 0
+        self.df = self._para_dataframe([]).astype({c: "category" for c in COLUNAS_CATEGORICAS})
+
+    @staticmethod
+    def _para_dataframe(valores):
+        linhas = [(linha + [""] * len(COLUNAS))[:len(COLUNAS)] for linha in valores]
+        df = pd.DataFrame(linhas, columns=COLUNAS)
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+        df["Resposta"] = pd.to_numeric(df["Resposta"], errors="coerce")
+        df["pontuacao"] = pd.to_numeric(df["pontuacao"], errors="coerce")
+        # Linhas gravadas antes da coluna instrumento são do instrumento padrão
+        df["instrumento"] = df["instrumento"].replace("", INSTRUMENTO_PADRAO).fillna(INSTRUMENTO_PADRAO)
+        return df
+
+    def _ler_novas(self, backend):
+        """Linhas depois da última sincronizada; refaz do zero se ela não confere mais."""
+        if self.linhas_sincronizadas and backend.nome == self.backend_sincronizado:
+            # Relê o último registro já sincronizado na mesma chamada que traz as novas
+            k = backend.linhas_por_registro
+            valores = backend.ler_linhas_desde(self.linhas_sincronizadas - k)
+            if len(valores) >= k and impressao_linha(valores[k - 1]) == self.impressao_ultima:
+                return valores[k:]
+        if self.linhas_sincronizadas:
+            print(f"Snapshot {self.caminho} não confere com o backend {backend.nome}: refazendo do zero.")
+        self._zerar()
+        self.backend_sincronizado = backend.nome
+        return backend.ler_linhas_desde(0)
+
+    def sincronizar(self, backend, forcar=False):
+        """Busca só as linhas novas no backend e grava o snapshot. Retorna o nº de linhas novas."""
+        with self._lock:
+            if not forcar and time.monotonic() - self._ultima_sync < self.intervalo_min_s:
+                return 0
+            valores = self._ler_novas(backend)
+            self._ultima_sync = time.monotonic()
+            if not valores:
+                return 0
+
+            novos = self._para_dataframe(valores)
+            df = pd.concat([self.df.astype({c: "object" for c in COLUNAS_CATEGORICAS}), novos],
+                           ignore_index=True)
+            self.df = df.astype({c: "category" for c in COLUNAS_CATEGORICAS})
+            self.linhas_sincronizadas += len(valores)
+            self.impressao_ultima = impressao_linha(valores[-1])
+
+            # Grava em arquivo temporário e troca, para não deixar snapshot pela metade
+            self.df.to_parquet(self.caminho + ".tmp", index=False)
+            os.replace(self.caminho + ".tmp", self.caminho)
+            with open(self.caminho_meta, "w", encoding="utf-8") as f:
+                json.dump({"versao": VERSAO_SNAPSHOT, "backend": self.backend_sincronizado,
+                           "linhas_sincronizadas": self.linhas_sincronizadas,
+                           "impressao_ultima": self.impressao_ultima}, f)
+            return len(valores)
+
+    def da_organizacao(self, id_org, instrumento):
+        with self._lock:
+            return self.df[(self.df["id_organizacao"] == id_org) & (self.df["instrumento"] == instrumento)].copy()
+
+
+@st.cache_resource
+def obter_snapshot(caminho):
+    return SnapshotRespostas(caminho)
+
+
+@st.cache_data(ttl=300, max_entries=64, show_spinner=False)
+def respostas_da_organizacao(_snapshot, _backend, id_org, instrumento):
+    """Respostas da organização no instrumento; cada par fica no cache por até 5 minutos."""
+    _snapshot.sincronizar(_backend)
+    df = _snapshot.da_organizacao(id_org, instrumento)
+    df["Bloco"] = df["Bloco"].cat.remove_unused_categories()
+    df["Item"] = df["Item"].cat.remove_unused_categories()
+    return df
+
+
+def renderizar_painel(snapshot, backend, agregados, id_org, nome_org, instrumento, indice_itens):
+    """Desenha o painel de resultados da organização validada pelo link, no instrumento escolhido."""
+    st.subheader(f"Resultados — {nome_org}")
+    blocos = agregados.ler(id_org, instrumento)
+    if not blocos:
+        st.info("Ainda não há respostas registradas para esta organização.")
+        return
+
+    # Toda submissão tem uma linha (talvez N/A) em cada bloco
+    st.metric("Respondentes", max(b["respondentes"] for b in blocos.values()))
+
+    # --- MÉDIAS POR BLOCO (AGREGADOS) ---
+    por_bloco = pd.DataFrame.from_dict(blocos, orient="index").rename(columns={"n": "respostas"})
+    por_bloco = por_bloco.reindex([b for b in indice_itens.nomes_blocos if b in blocos])
+    st.markdown("#### Média por bloco")
+    st.bar_chart(por_bloco["media"])
+    st.dataframe(por_bloco[["media", "desvio", "respostas"]].round(2), use_container_width=True)
+
+    df = respostas_da_organizacao(snapshot, backend, id_org, instrumento)
+    if df.empty:
+        return
+    # Uma submissão por id_envio; linhas antigas, sem ele, por timestamp + respondente
+    chave_envio = df["id_envio"].where(df["id_envio"] != "",
+                                       df["timestamp"].astype(str) + "|" + df["respondente"].astype(str))
+    submissoes = df.assign(_envio=chave_envio).dropna(subset=["timestamp"]).drop_duplicates("_envio")
+
+    # --- ITENS REVERSOS ---
+    reversos = set(indice_itens.textos[indice_itens.reverso].tolist())
+    df_rev = df[df["Item"].isin(reversos)]
+    if not df_rev.empty:
+        st.markdown("#### Itens reversos (R)")
+        st.dataframe(
+            df_rev.groupby(["Bloco", "Item"], observed=True)
+                  .agg(resposta_media=("Resposta", "mean"), pontuacao_media=("pontuacao", "mean"),
+                       respostas=("Resposta", "count"))
+                  .round(2),
+            use_container_width=True,
+        )
+
+    # --- RESPOSTAS AO LONGO DO TEMPO ---
+    st.markdown("#### Respondentes por dia")
+    st.line_chart(submissoes.set_index("timestamp").resample("D").size())
@@ -1,41 +1,262 @@
+import argparse
+import base64
+import json
+import os
+import socket
+import ssl
+import struct
+import sys
 import time
-from playwright.sync_api import sync_playwright
+import urllib.error
+import urllib.parse
+import urllib.request
 
 # --- CONFIGURAÇÕES ---
-# Coloque a URL completa do seu aplicativo Streamlit aqui
-URL_DO_APP = "https://wedja-fatoresinterpesoais.streamlit.app/" 
-# Coloque o texto exato do botão que você quer clicar
-TEXTO_DO_BOTAO = "Finalizar e Gerar Relatório"
-
-def ping_e_clica():
-    print(f"Iniciando o ping para: {URL_DO_APP}")
-    with sync_playwright() as p:
+# URL completa do aplicativo Streamlit (pode ser trocada com --url)
+URL_DO_APP = "https://wedja-fatoresinterpesoais.streamlit.app/"
+# Endpoints HTTP do próprio Streamlit
+ENDPOINT_SAUDE = "_stcore/health"
+ENDPOINT_STREAM = "_stcore/stream"
+# No Streamlit Community Cloud a página raiz é a casca da Cloud; o servidor do
+# app responde em /~/+/ (inclusive /~/+/_stcore/health e o websocket)
+PREFIXO_CLOUD = "/~/+/"
+
+# Aquece o app sem navegador: acessa a página (o que acorda o contêiner),
+# consulta /_stcore/health do servidor do app até responder "ok" e abre uma
+# sessão pelo websocket, pedindo uma execução do script (o que conta como
+# atividade do app, como o acesso pelo navegador). Mede a latência da partida
+# a frio, de uma chamada já aquecida e da primeira execução. Para testar localmente:
+#   streamlit run inventario_fatores_interpessoais_app.py --server.port 8501
+#   python pinger.py --url http://localhost:8501/
+
+
+def _get(url, timeout):
+    """GET simples; retorna (status, corpo, segundos)."""
+    inicio = time.perf_counter()
+    req = urllib.request.Request(url, headers={"User-Agent": "wedja-pinger"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            corpo = resp.read().decode("utf-8", errors="replace")
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status, corpo = e.code, ""
+    return status, corpo, time.perf_counter() - inicio
+
+
+def url_do_servidor(url_app):
+    """URL base do servidor Streamlit do app (com / no fim)."""
+    partes = urllib.parse.urlsplit(url_app)
+    if (partes.hostname or "").endswith(".streamlit.app") and PREFIXO_CLOUD not in partes.path:
+        return urllib.parse.urljoin(url_app, PREFIXO_CLOUD)
+    return url_app if url_app.endswith("/") else url_app + "/"
+
+
+def aguardar_pronto(url_servidor, timeout_total=180.0, intervalo=2.0, timeout_req=30.0):
+    """Consulta o health check até o servidor responder "ok". Retorna os segundos até ficar pronto."""
+    url_saude = urllib.parse.urljoin(url_servidor, ENDPOINT_SAUDE)
+    inicio = time.perf_counter()
+    ultimo_erro = None
+    while time.perf_counter() - inicio < timeout_total:
         try:
-            # Inicia o navegador (headless=True roda em segundo plano, sem abrir janela)
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            # Navega até a URL do seu app
-            print("Acessando a página...")
-            page.goto(URL_DO_APP, timeout=120000) # Timeout de 2 minutos para carregar
-            
-            # Espera um tempo extra para o Streamlit renderizar tudo
-            print("Página carregada. Aguardando 10 segundos para renderização completa...")
-            time.sleep(10)
-            
-            # Clica no botão
-            print(f"Procurando e clicando no botão com o texto: '{TEXTO_DO_BOTAO}'")
-            page.locator("#autoclick-div button").click()
-            
-            # Espera mais um pouco para a ação do clique ser processada
-            print("Botão clicado. Aguardando 5 segundos...")
-            time.sleep(5)
-            
-            browser.close()
-            print("Ping com clique concluído com sucesso!")
-
-        except Exception as e:
-            print(f"Ocorreu um erro: {e}")
+            status, corpo, _ = _get(url_saude, timeout_req)
+            if status == 200 and corpo.strip() == "ok":
+                return time.perf_counter() - inicio
+            ultimo_erro = f"HTTP {status}"
+        except (urllib.error.URLError, OSError) as e:
+            ultimo_erro = str(e)
+        time.sleep(intervalo)
+    raise TimeoutError(f"App não ficou pronto em {timeout_total:.0f}s ({ultimo_erro})")
+
+
+# --- SESSÃO PELO WEBSOCKET ---
+# Mensagens do protocolo do Streamlit (protobuf), codificadas à mão para não
+# depender do pacote streamlit: BackMsg.rerun_script (campo 11) com um
+# ClientState vazio, e ForwardMsg.script_finished (campo 6) na resposta.
+BACKMSG_RERUN = bytes([(11 << 3) | 2, 0])
+CAMPO_SCRIPT_FINISHED = 6
+SCRIPT_TERMINADO = {0: "sucesso", 1: "erro_de_compilacao", 2: "interrompido", 3: "fragmento"}
+
+
+def _varint(dados, pos):
+    valor, deslocamento = 0, 0
+    while True:
+        byte = dados[pos]
+        pos += 1
+        valor |= (byte & 0x7F) << deslocamento
+        if not byte & 0x80:
+            return valor, pos
+        deslocamento += 7
+
+
+def _campos_varint(mensagem):
+    """Campos varint do primeiro nível de uma mensagem protobuf: {número: valor}."""
+    campos, pos = {}, 0
+    while pos < len(mensagem):
+        chave, pos = _varint(mensagem, pos)
+        tipo = chave & 7
+        if tipo == 0:
+            campos[chave >> 3], pos = _varint(mensagem, pos)
+        elif tipo == 1:
+            pos += 8
+        elif tipo == 2:
+            tamanho, pos = _varint(mensagem, pos)
+            pos += tamanho
+        elif tipo == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Tipo de campo protobuf não suportado: {tipo}")
+    return campos
+
+
+def _ler_exato(arquivo, n):
+    dados = arquivo.read(n)
+    if len(dados) < n:
+        raise ConnectionError("Websocket fechado pelo servidor.")
+    return dados
+
+
+def _ler_mensagem(arquivo):
+    """Lê uma mensagem do websocket (juntando fragmentos). Retorna (opcode, dados)."""
+    partes, opcode = [], None
+    while True:
+        b0, b1 = _ler_exato(arquivo, 2)
+        tamanho = b1 & 0x7F
+        if tamanho == 126:
+            (tamanho,) = struct.unpack(">H", _ler_exato(arquivo, 2))
+        elif tamanho == 127:
+            (tamanho,) = struct.unpack(">Q", _ler_exato(arquivo, 8))
+        dados = _ler_exato(arquivo, tamanho)
+        if b0 & 0x0F >= 0x8:
+            return b0 & 0x0F, dados  # controle (close, ping, pong): nunca fragmentado
+        opcode = opcode or b0 & 0x0F
+        partes.append(dados)
+        if b0 & 0x80:
+            return opcode, b"".join(partes)
+
+
+def _quadro(opcode, dados):
+    """Quadro do cliente para o servidor (sempre mascarado)."""
+    mascara = os.urandom(4)
+    if len(dados) < 126:
+        cabecalho = struct.pack(">BB", 0x80 | opcode, 0x80 | len(dados))
+    elif len(dados) < 1 << 16:
+        cabecalho = struct.pack(">BBH", 0x80 | opcode, 0x80 | 126, len(dados))
+    else:
+        cabecalho = struct.pack(">BBQ", 0x80 | opcode, 0x80 | 127, len(dados))
+    return cabecalho + mascara + bytes(b ^ mascara[i % 4] for i, b in enumerate(dados))
+
+
+def abrir_sessao(url_servidor, timeout=60.0):
+    """Abre uma sessão do Streamlit pelo websocket e espera uma execução completa do script.
+
+    Retorna {"websocket_s", "sessao_s", "mensagens", "script"}.
+    """
+    partes = urllib.parse.urlsplit(urllib.parse.urljoin(url_servidor, ENDPOINT_STREAM))
+    https = partes.scheme == "https"
+    porta = partes.port or (443 if https else 80)
+    inicio = time.perf_counter()
+    sock = socket.create_connection((partes.hostname, porta), timeout=timeout)
+    if https:
+        sock = ssl.create_default_context().wrap_socket(sock, server_hostname=partes.hostname)
+    arquivo = sock.makefile("rb")
+    try:
+        sock.sendall((
+            f"GET {partes.path} HTTP/1.1\r\n"
+            f"Host: {partes.netloc}\r\n"
+            "Connection: Upgrade\r\n"
+            "Upgrade: websocket\r\n"
+            "Sec-WebSocket-Version: 13\r\n"
+            f"Sec-WebSocket-Key: {base64.b64encode(os.urandom(16)).decode()}\r\n"
+            "Sec-WebSocket-Protocol: streamlit\r\n"
+            "User-Agent: wedja-pinger\r\n\r\n"
+        ).encode())
+        status = arquivo.readline().decode("latin-1").split()
+        if len(status) < 2 or status[1] != "101":
+            raise ConnectionError(f"Handshake do websocket falhou: {' '.join(status)}")
+        while arquivo.readline() not in (b"\r\n", b"\n", b""):
+            pass  # cabeçalhos da resposta
+        resultado = {"websocket_s": round(time.perf_counter() - inicio, 3)}
+
+        sock.sendall(_quadro(0x2, BACKMSG_RERUN))
+        mensagens = 0
+        while True:
+            opcode, dados = _ler_mensagem(arquivo)
+            if opcode == 0x8:
+                raise ConnectionError("Websocket fechado pelo servidor antes do fim do script.")
+            if opcode == 0x9:
+                sock.sendall(_quadro(0xA, dados))
+                continue
+            if opcode != 0x2:
+                continue
+            mensagens += 1
+            status_script = _campos_varint(dados).get(CAMPO_SCRIPT_FINISHED)
+            if status_script is not None and status_script != 2:
+                resultado["sessao_s"] = round(time.perf_counter() - inicio, 3)
+                resultado["mensagens"] = mensagens
+                resultado["script"] = SCRIPT_TERMINADO.get(status_script, str(status_script))
+                try:
+                    sock.sendall(_quadro(0x8, struct.pack(">H", 1000)))
+                except OSError:
+                    pass
+                return resultado
+    finally:
+        arquivo.close()
+        sock.close()
+
+
+def aquecer(url_app, timeout_total=180.0, intervalo=2.0, sessao=True):
+    """Acorda o app e retorna um dicionário com as latências medidas."""
+    url_servidor = url_do_servidor(url_app)
+    print(f"Iniciando o aquecimento de: {url_app} (servidor em {url_servidor})")
+    resultado = {"url": url_app, "servidor": url_servidor, "inicio": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    # 1. Acessa a página: no Streamlit Cloud é isso que acorda o contêiner
+    try:
+        status, _, segundos = _get(url_app, timeout=timeout_total)
+        resultado["pagina_status"] = status
+        resultado["pagina_s"] = round(segundos, 3)
+    except (urllib.error.URLError, OSError) as e:
+        resultado["pagina_erro"] = str(e)  # servidor ainda subindo: o health check espera
+
+    # 2. Espera o servidor do app responder ao health check (partida a frio)
+    resultado["pronto_s"] = round(aguardar_pronto(url_servidor, timeout_total, intervalo), 3)
+
+    # 3. Mede uma chamada com o app já aquecido
+    _, _, segundos = _get(urllib.parse.urljoin(url_servidor, ENDPOINT_SAUDE), timeout=30.0)
+    resultado["aquecido_s"] = round(segundos, 3)
+
+    # 4. Abre uma sessão e executa o script, como um visitante
+    if sessao:
+        resultado.update(abrir_sessao(url_servidor, timeout=timeout_total))
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantém o app Streamlit aquecido via HTTP.")
+    parser.add_argument("--url", default=URL_DO_APP)
+    parser.add_argument("--timeout", type=float, default=180.0, help="tempo máximo até o app ficar pronto (s)")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="intervalo entre consultas ao health check (s)")
+    parser.add_argument("--sem-sessao", action="store_true",
+                        help="só acorda e consulta o health check, sem abrir uma sessão pelo websocket")
+    parser.add_argument("--saida", help="arquivo JSONL onde anexar o resultado")
+    parser.add_argument("--estrito", action="store_true",
+                        help="termina com código 1 em caso de erro (por padrão só registra o erro)")
+    args = parser.parse_args(argv)
+
+    try:
+        resultado = aquecer(args.url, args.timeout, args.intervalo, not args.sem_sessao)
+    except Exception as e:
+        # Um app que não acordou a tempo é esperado às vezes: não falha a execução agendada
+        print(f"Ocorreu um erro: {e}")
+        return 1 if args.estrito else 0
+
+    print(json.dumps(resultado, ensure_ascii=False))
+    if args.saida:
+        with open(args.saida, "a", encoding="utf-8") as f:
+            f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    print("Aquecimento concluído com sucesso!")
+    return 0
+
 
 if __name__ == "__main__":
-    ping_e_clica()
\ No newline at end of file
+    sys.exit(main())
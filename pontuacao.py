@@ -0,0 +1,112 @@
+# pontuacao.py
+# Motor de pontuação vetorizado do inventário. O índice de itens é calculado
+# uma vez (IDs, blocos e flags de reverso como arrays NumPy) e a inversão,
+# a máscara de N/A e as médias por bloco viram operações de array, tanto para
+# um respondente (vetor de 56 posições) quanto para um lote (matriz N x 56).
+import numpy as np
+
+from instrumento import ESCALA_MAX
+
+
+class IndiceItens:
+    """Índice pré-calculado dos itens do instrumento."""
+
+    __slots__ = ("ids", "blocos", "textos", "reverso", "nomes_blocos",
+                 "codigo_bloco", "matriz_blocos", "posicao")
+
+    def __init__(self, ids, blocos, textos, reverso):
+        self.ids = np.asarray(ids, dtype=object)
+        self.blocos = np.asarray(blocos, dtype=object)
+        self.textos = np.asarray(textos, dtype=object)
+        self.reverso = np.asarray(reverso, dtype=bool)
+        # Blocos na ordem em que aparecem no instrumento
+        self.nomes_blocos = tuple(dict.fromkeys(self.blocos.tolist()))
+        codigos = {nome: i for i, nome in enumerate(self.nomes_blocos)}
+        self.codigo_bloco = np.fromiter((codigos[b] for b in self.blocos), dtype=np.intp, count=len(self.blocos))
+        # Matriz item x bloco (one-hot): somas por bloco viram um produto de matrizes
+        self.matriz_blocos = np.zeros((len(self.ids), len(self.nomes_blocos)))
+        self.matriz_blocos[np.arange(len(self.ids)), self.codigo_bloco] = 1.0
+        self.posicao = {item_id: i for i, item_id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def de_instrumento(cls, instrumento):
+        """Cria o índice a partir de um `instrumento.Instrumento` compilado."""
+        itens = instrumento.itens
+        return cls(
+            [item.id for item in itens],
+            [item.bloco for item in itens],
+            [item.texto for item in itens],
+            [item.reverso for item in itens],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def codificar_respostas(indice, respostas):
+    """Converte {item_id: resposta} em vetor float; N/A e itens sem resposta viram NaN."""
+    vetor = np.full(len(indice), np.nan)
+    for item_id, resposta in respostas.items():
+        pos = indice.posicao.get(item_id)
+        if pos is None or resposta is None or resposta == "N/A":
+            continue
+        try:
+            vetor[pos] = int(resposta)
+        except (TypeError, ValueError):
+            pass
+    return vetor
+
+
+def codificar_lote(indice, lista_respostas):
+    """Empilha vários respondentes numa matriz N x n_itens."""
+    if not lista_respostas:
+        return np.empty((0, len(indice)))
+    return np.vstack([codificar_respostas(indice, r) for r in lista_respostas])
+
+
+def pontuar(indice, respostas):
+    """Aplica a inversão dos itens reversos (6 − resposta); NaN é preservado.
+
+    Aceita um vetor (1 respondente) ou uma matriz (N respondentes x itens).
+    """
+    respostas = np.asarray(respostas, dtype=float)
+    return np.where(indice.reverso, (ESCALA_MAX + 1) - respostas, respostas)
+
+
+def medias_por_bloco(indice, pontuacoes):
+    """Retorna (médias, contagens) por bloco, ignorando N/A.
+
+    Para uma matriz N x itens, o resultado tem formato N x blocos. Blocos sem
+    nenhuma resposta válida ficam com média NaN.
+    """
+    pontuacoes = np.asarray(pontuacoes, dtype=float)
+    validas = ~np.isnan(pontuacoes)
+    somas = np.where(validas, pontuacoes, 0.0) @ indice.matriz_blocos
+    contagens = validas.astype(float) @ indice.matriz_blocos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        medias = np.where(contagens > 0, somas / contagens, np.nan)
+    return medias, contagens.astype(int)
+
+
+def linhas_para_planilha(indice, respostas, cabecalho, colunas_finais=()):
+    """Monta as linhas de `respostas_para_enviar` para um respondente.
+
+    `cabecalho` são as colunas fixas de cada linha (timestamp, id_organizacao,
+    respondente, data, organização); em seguida vêm Bloco, Item, Resposta e
+    pontuação, com "N/A" onde não houver resposta válida, e por fim
+    `colunas_finais` (a chave do instrumento).
+    """
+    vetor = codificar_respostas(indice, respostas)
+    pontos = pontuar(indice, vetor)
+    validas = ~np.isnan(vetor)
+    cabecalho = list(cabecalho)
+    colunas_finais = list(colunas_finais)
+    linhas = []
+    for i in range(len(indice)):
+        if validas[i]:
+            resposta, pontuacao = int(vetor[i]), int(pontos[i])
+        else:
+            resposta = respostas.get(indice.ids[i])
+            resposta, pontuacao = ("N/A" if resposta is None else resposta), "N/A"
+        linhas.append(cabecalho + [indice.blocos[i], indice.textos[i], resposta, pontuacao] + colunas_finais)
+    return linhas
@@ -0,0 +1,179 @@
+# spool_local.py
+# Registro local (append-only) das submissões, gravado antes de qualquer envio
+# para a planilha. Usa SQLite em modo WAL: cada submissão é uma entrada que só
+# é marcada como confirmada depois que o append_rows na planilha deu certo.
+# Entradas que falham repetidamente com erro não transitório vão para a
+# quarentena: saem da fila, mas continuam no spool para inspeção e reenvio.
+#
+# Inspeção e reenvio da quarentena:
+#   python spool_local.py spool_respostas.db
+#   python spool_local.py spool_respostas.db --liberar 12 15
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+# Colunas acrescentadas depois da criação do spool (migração com ALTER TABLE)
+COLUNAS_MIGRADAS = {
+    "id_envio": "TEXT",
+    "falhas": "INTEGER NOT NULL DEFAULT 0",
+    "ultimo_erro": "TEXT",
+    "quarentena_em": "TEXT",
+}
+
+
+class SpoolLocal:
+    """Fila durável de submissões em SQLite (WAL)."""
+
+    def __init__(self, caminho="spool_respostas.db"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL faz o fsync do WAL a cada commit: a submissão sobrevive a uma queda do processo
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entradas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recebido_em TEXT NOT NULL,
+                n_linhas INTEGER NOT NULL,
+                linhas TEXT NOT NULL,
+                confirmado_em TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entradas_pendentes ON entradas(id) WHERE confirmado_em IS NULL"
+        )
+        # Spools criados antes da deduplicação e da quarentena não têm essas colunas
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(entradas)")}
+        for coluna, tipo in COLUNAS_MIGRADAS.items():
+            if coluna not in colunas:
+                self._conn.execute(f"ALTER TABLE entradas ADD COLUMN {coluna} {tipo}")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_entradas_id_envio ON entradas(id_envio)")
+
+    def gravar(self, linhas, id_envio=None):
+        """Grava as linhas de uma submissão (layout de `respostas_para_enviar`) e retorna o id.
+
+        Com `id_envio`, uma submissão repetida não é gravada de novo e o
+        retorno é None.
+        """
+        linhas = [list(linha) for linha in linhas]
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO entradas (recebido_em, n_linhas, linhas, id_envio) VALUES (?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), len(linhas),
+                 json.dumps(linhas, ensure_ascii=False, default=str), id_envio),
+            )
+            return cur.lastrowid if cur.rowcount else None
+
+    def contem_envio(self, id_envio):
+        """Indica se a submissão já está no spool (pendente ou confirmada)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM entradas WHERE id_envio = ?", (id_envio,)
+            ).fetchone() is not None
+
+    def pendentes(self, max_linhas=None):
+        """Retorna [(id, linhas)] ainda não confirmados nem em quarentena, em ordem de chegada.
+
+        Com `max_linhas`, para antes de ultrapassar o limite (mas sempre retorna
+        ao menos uma entrada, se houver).
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT id, n_linhas, linhas FROM entradas "
+                "WHERE confirmado_em IS NULL AND quarentena_em IS NULL ORDER BY id"
+            )
+            lote, total = [], 0
+            for id_entrada, n_linhas, linhas in cur:
+                if max_linhas is not None and lote and total + n_linhas > max_linhas:
+                    break
+                lote.append((id_entrada, json.loads(linhas)))
+                total += n_linhas
+            return lote
+
+    def confirmar(self, ids):
+        """Marca as entradas como gravadas na planilha."""
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE entradas SET confirmado_em = ? WHERE id = ? AND confirmado_em IS NULL",
+                [(agora, id_entrada) for id_entrada in ids],
+            )
+            self._conn.execute("COMMIT")
+
+    def contar_pendentes(self):
+        """Número de linhas aguardando confirmação (fora da quarentena)."""
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(n_linhas), 0) FROM entradas "
+                "WHERE confirmado_em IS NULL AND quarentena_em IS NULL"
+            ).fetchone()
+            return total
+
+    # --- FALHAS E QUARENTENA ---
+    def registrar_falha(self, id_entrada, erro, max_falhas):
+        """Conta uma falha da entrada; na `max_falhas`-ésima ela vai para a quarentena.
+
+        Retorna True se a entrada entrou em quarentena.
+        """
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entradas SET falhas = falhas + 1, ultimo_erro = ?, "
+                "quarentena_em = CASE WHEN falhas + 1 >= ? THEN ? END "
+                "WHERE id = ? AND confirmado_em IS NULL",
+                (str(erro)[:500], max_falhas, agora, id_entrada),
+            )
+            return self._conn.execute(
+                "SELECT quarentena_em IS NOT NULL FROM entradas WHERE id = ?", (id_entrada,)
+            ).fetchone() == (1,)
+
+    def quarentena(self):
+        """Retorna [(id, recebido_em, n_linhas, falhas, ultimo_erro)] das entradas em quarentena."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, recebido_em, n_linhas, falhas, ultimo_erro FROM entradas "
+                "WHERE confirmado_em IS NULL AND quarentena_em IS NOT NULL ORDER BY id"
+            ).fetchall()
+
+    def liberar(self, ids):
+        """Devolve entradas da quarentena à fila, com o contador de falhas zerado."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE entradas SET quarentena_em = NULL, falhas = 0 "
+                "WHERE id = ? AND confirmado_em IS NULL",
+                [(id_entrada,) for id_entrada in ids],
+            )
+            self._conn.execute("COMMIT")
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lista ou libera as entradas em quarentena do spool.")
+    parser.add_argument("spool", help="arquivo SQLite do spool (SPOOL_CAMINHO)")
+    parser.add_argument("--liberar", nargs="+", type=int, metavar="ID",
+                        help="devolve as entradas à fila (reenviadas junto com o próximo lote)")
+    args = parser.parse_args(argv)
+
+    spool = SpoolLocal(args.spool)
+    if args.liberar:
+        spool.liberar(args.liberar)
+        print(f"{len(args.liberar)} entradas devolvidas à fila.")
+        return 0
+    entradas = spool.quarentena()
+    for id_entrada, recebido_em, n_linhas, falhas, ultimo_erro in entradas:
+        print(f"{id_entrada}\t{recebido_em}\t{n_linhas} linhas\t{falhas} falhas\t{ultimo_erro}")
+    print(f"{len(entradas)} entradas em quarentena.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
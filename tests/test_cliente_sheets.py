@@ -0,0 +1,227 @@
+# test_cliente_sheets.py
+# ClienteSheets com o gspread de verdade contra uma API do Sheets falsa
+# (http.server local): 429/5xx com backoff, 401 com reconexão, balde de tokens
+# e append_rows que não é repetido depois de um timeout de leitura.
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+gspread = pytest.importorskip("gspread")
+requests = pytest.importorskip("requests")
+
+from armazenamento import BackendSheets  # noqa: E402
+from cliente_sheets import BaldeTokens, ClienteSheets, EscritaIncerta  # noqa: E402
+from fila_envio import FilaEnvio  # noqa: E402
+from formato_compacto import COLUNAS_LONGAS  # noqa: E402
+from spool_local import SpoolLocal  # noqa: E402
+
+CHAVE, ABA = "planilha-teste", "Fatores_Interpessoais"
+INTERVALO = re.compile(r"([A-Z]+)(\d+)(?::([A-Z]+)(\d*))?")
+
+
+def _numero_coluna(letras):
+    n = 0
+    for letra in letras:
+        n = n * 26 + ord(letra) - ord("A") + 1
+    return n
+
+
+class PlanilhaHTTP(BaseHTTPRequestHandler):
+    """Subconjunto da API v4 usado pelo gspread: metadados, values.get, values.append e values.update."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._tratar()
+
+    def do_POST(self):
+        self._tratar()
+
+    def do_PUT(self):
+        self._tratar()
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _tratar(self):
+        estado = self.server.estado
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = json.loads(self.rfile.read(tamanho)) if tamanho else None
+        caminho = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        with estado["lock"]:
+            estado["requisicoes"].append((self.command, caminho))
+            status = estado["falhas"].pop(0) if estado["falhas"] else 200
+        if status != 200:
+            self._responder(status, {"error": {"code": status, "message": "falha simulada", "status": "FALHA"}})
+            return
+
+        prefixo = f"/v4/spreadsheets/{CHAVE}"
+        if caminho == prefixo:
+            self._responder(200, {"spreadsheetId": CHAVE, "properties": {"title": "Respostas Formularios"},
+                                  "sheets": [{"properties": {"sheetId": 0, "title": ABA, "index": 0,
+                                                             "gridProperties": {"rowCount": 1000,
+                                                                                "columnCount": 26}}}]})
+            return
+
+        intervalo = caminho[len(prefixo + "/values/"):]
+        if intervalo.endswith(":append"):
+            if estado["atraso_append_s"]:
+                time.sleep(estado["atraso_append_s"])
+            with estado["lock"]:
+                estado["linhas"].extend(corpo["values"])
+            self._responder(200, {"spreadsheetId": CHAVE, "updates": {"updatedRows": len(corpo["values"])}})
+            return
+
+        inicio = INTERVALO.match(intervalo.split("!")[-1])
+        col_ini, linha_ini = _numero_coluna(inicio.group(1)), int(inicio.group(2))
+        col_fim = _numero_coluna(inicio.group(3)) if inicio.group(3) else col_ini
+        if self.command == "PUT":
+            with estado["lock"]:
+                for i, valores in enumerate(corpo["values"]):
+                    while len(estado["linhas"]) < linha_ini + i:
+                        estado["linhas"].append([])
+                    linha = estado["linhas"][linha_ini + i - 1]
+                    linha.extend([""] * (col_ini - 1 + len(valores) - len(linha)))
+                    linha[col_ini - 1:col_ini - 1 + len(valores)] = valores
+            self._responder(200, {"spreadsheetId": CHAVE, "updatedRange": intervalo})
+            return
+
+        with estado["lock"]:
+            valores = [linha[col_ini - 1:col_fim] for linha in estado["linhas"][linha_ini - 1:]]
+        self._responder(200, {"range": intervalo, "majorDimension": "ROWS", "values": valores})
+
+
+class SessaoLocal(requests.Session):
+    """Sessão que redireciona a API do Sheets para o servidor falso."""
+
+    def __init__(self, base):
+        super().__init__()
+        self.base = base
+
+    def request(self, method, url, *args, **kwargs):
+        return super().request(method, url.replace("https://sheets.googleapis.com", self.base), *args, **kwargs)
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PlanilhaHTTP)
+    httpd.estado = {"lock": threading.Lock(), "requisicoes": [], "falhas": [], "linhas": [],
+                    "atraso_append_s": 0.0}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def novo_cliente(servidor, timeout=None, **kwargs):
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    def conectar():
+        gc = gspread.Client(None, session=SessaoLocal(base))
+        if timeout is not None:
+            gc.set_timeout(timeout)
+        return gc.open_by_key(CHAVE).worksheet(ABA)
+
+    kwargs.setdefault("backoff_base_s", 0.01)
+    return ClienteSheets(conectar, **kwargs)
+
+
+def _valores(servidor):
+    return [r for r in servidor.estado["requisicoes"] if "/values/" in r[1]]
+
+
+def test_429_e_5xx_na_leitura_sao_repetidos_com_backoff(servidor):
+    cliente = novo_cliente(servidor)
+    cliente.append_rows([["a", "1"]])
+    servidor.estado["falhas"] = [429, 503]
+
+    assert cliente.get("A1:B") == [["a", "1"]]
+    assert len(_valores(servidor)) == 4  # append + 2 falhas + leitura
+    assert cliente.saude()["falhas_consecutivas"] == 0
+
+
+def test_429_no_append_e_repetido(servidor):
+    cliente = novo_cliente(servidor)
+    cliente.get("A1:B")
+    servidor.estado["falhas"] = [429]
+
+    cliente.append_rows([["a", "1"]])
+    assert servidor.estado["linhas"] == [["a", "1"]]
+
+
+def test_5xx_no_append_nao_e_repetido(servidor):
+    cliente = novo_cliente(servidor)
+    cliente.get("A1:B")
+    servidor.estado["falhas"] = [500]
+
+    with pytest.raises(EscritaIncerta):
+        cliente.append_rows([["a", "1"]])
+    assert [r[1].endswith(":append") for r in _valores(servidor)].count(True) == 1
+
+
+def test_401_reconecta(servidor):
+    cliente = novo_cliente(servidor)
+    cliente.get("A1:B")
+    servidor.estado["falhas"] = [401]
+
+    cliente.get("A1:B")
+    assert cliente.saude()["conexoes"] == 2
+
+
+def test_balde_de_tokens_espera_pela_cota(servidor):
+    cliente = novo_cliente(servidor)
+    cliente.baldes["leitura"] = BaldeTokens(600, capacidade=1)  # uma leitura a cada 0,1 s
+    cliente.get("A1:B")
+
+    inicio = time.monotonic()
+    for _ in range(4):
+        cliente.get("A1:B")
+    assert time.monotonic() - inicio >= 0.35
+
+
+def test_timeout_de_leitura_no_append_nao_e_repetido(servidor):
+    cliente = novo_cliente(servidor, timeout=0.3)
+    with pytest.raises(EscritaIncerta):
+        servidor.estado["atraso_append_s"] = 0.6
+        cliente.append_rows([["a", "1"]])
+    time.sleep(0.6)  # o servidor aplica o append depois do timeout do cliente
+    assert servidor.estado["linhas"] == [["a", "1"]]
+    assert [r[1].endswith(":append") for r in _valores(servidor)].count(True) == 1
+
+
+def test_fila_confere_id_envio_depois_de_escrita_incerta(servidor, tmp_path):
+    servidor.estado["atraso_append_s"] = 0.6
+    backend = BackendSheets(novo_cliente(servidor, timeout=0.3))
+    spool = SpoolLocal(str(tmp_path / "spool.db"))
+    linhas = [["2026-01-01T10:00:00", "org", "", "2026-01-01", "Org", "Bloco", "Item", "3", "3",
+               "fatores_interpessoais", "envio-1"]]
+    spool.gravar(linhas, "envio-1")
+
+    # A primeira janela estoura o timeout; a seguinte (depois do backoff) encontra o id_envio na aba
+    fila = FilaEnvio(backend, spool, intervalo_s=0.1, backoff_base_s=1.0)
+    limite = time.monotonic() + 10
+    while spool.contar_pendentes() and time.monotonic() < limite:
+        time.sleep(0.1)
+    fila.parar(timeout=5)
+
+    assert spool.contar_pendentes() == 0
+    assert servidor.estado["linhas"] == [list(COLUNAS_LONGAS)] + linhas
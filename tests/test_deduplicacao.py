@@ -0,0 +1,66 @@
+# test_deduplicacao.py
+# Limpeza offline de submissões repetidas no formato longo: cópias com o mesmo
+# id_envio e, com por_conteudo, submissões iguais do mesmo respondente.
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from deduplicacao import LRUEnvios, deduplicar_linhas  # noqa: E402
+
+
+def submissao(id_envio, respondente="Ana", respostas=(5, 3), timestamp="2026-01-01T10:00:00"):
+    linhas = []
+    for i, resposta in enumerate(respostas):
+        linha = [timestamp, "org", respondente, "2026-01-01", "Org", "Comunicação", f"Item {i}",
+                 resposta, resposta, "fatores_interpessoais"]
+        linhas.append(linha + [id_envio] if id_envio is not None else linha)
+    return linhas
+
+
+def test_copias_do_mesmo_id_envio_sao_removidas():
+    linhas = submissao("e1") + submissao("e2") + submissao("e1") + submissao("e1")
+
+    mantidas, removidas = deduplicar_linhas(linhas)
+
+    assert mantidas == submissao("e1") + submissao("e2")
+    assert removidas == 2
+
+
+def test_sem_por_conteudo_respostas_iguais_sao_mantidas():
+    linhas = submissao("e1") + submissao("e2", timestamp="2026-01-01T10:05:00") + submissao(None)
+
+    mantidas, removidas = deduplicar_linhas(linhas)
+
+    assert mantidas == linhas
+    assert removidas == 0
+
+
+def test_por_conteudo_remove_submissoes_iguais_do_mesmo_respondente():
+    linhas = (submissao("e1") + submissao("e2", timestamp="2026-01-01T10:05:00")
+              + submissao(None, timestamp="2026-01-01T10:06:00")
+              + submissao("e3", respostas=(5, 4)) + submissao("e4", respondente="Bia"))
+
+    mantidas, removidas = deduplicar_linhas(linhas, por_conteudo=True)
+
+    assert mantidas == submissao("e1") + submissao("e3", respostas=(5, 4)) + submissao("e4", respondente="Bia")
+    assert removidas == 2
+
+
+def test_por_conteudo_nunca_junta_respondentes_anonimos():
+    linhas = submissao("e1", respondente="") + submissao("e2", respondente="  ")
+
+    mantidas, removidas = deduplicar_linhas(linhas, por_conteudo=True)
+
+    assert mantidas == linhas
+    assert removidas == 0
+
+
+def test_lru_descarta_o_id_mais_antigo():
+    recentes = LRUEnvios(capacidade=2)
+    for id_envio in ("e1", "e2", "e3"):
+        recentes.adicionar(id_envio)
+
+    assert not recentes.contem("e1")
+    assert recentes.contem("e2") and recentes.contem("e3")
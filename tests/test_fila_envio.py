@@ -0,0 +1,97 @@
+# test_fila_envio.py
+# FilaEnvio com spool e backends de verdade: uma entrada malformada só vai para
+# a quarentena quando as outras do lote são gravadas, erros do destino (aba
+# inexistente) deixam tudo pendente e parar() interrompe o backoff.
+import os
+import sys
+import time
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from armazenamento import BackendSheets, BackendSQLite  # noqa: E402
+from cliente_sheets import ClienteSheets  # noqa: E402
+from fila_envio import FilaEnvio  # noqa: E402
+from spool_local import SpoolLocal  # noqa: E402
+
+
+def linhas_envio(id_envio, bloco="Comunicação"):
+    return [["2026-01-01T10:00:00", "org", "", "2026-01-01", "Org", bloco, "Item", "3", "3",
+             "fatores_interpessoais", id_envio]]
+
+
+def esperar(condicao, limite_s=10.0):
+    limite = time.monotonic() + limite_s
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.05)
+    return condicao()
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = SpoolLocal(str(tmp_path / "spool.db"))
+    yield spool
+    spool.fechar()
+
+
+def test_entrada_malformada_vai_para_quarentena_sem_bloquear_as_outras(spool, tmp_path):
+    backend = BackendSQLite(str(tmp_path / "respostas.db"))
+    spool.gravar(linhas_envio("ok-1"), "ok-1")
+    spool.gravar(linhas_envio("ruim", bloco=None), "ruim")  # bloco NOT NULL no SQLite
+    spool.gravar(linhas_envio("ok-2"), "ok-2")
+
+    # Depois que as outras são gravadas ela fica sozinha no lote e não é mais cobrada
+    fila = FilaEnvio(backend, spool, intervalo_s=0.1, backoff_base_s=0.05, max_falhas=1)
+    esperar(lambda: spool.quarentena())
+    fila.parar(timeout=5)
+
+    assert [linha[10] for linha in backend.ler_linhas_desde(0)] == ["ok-1", "ok-2"]
+    assert [(falhas, erro.startswith("NOT NULL")) for _, _, _, falhas, erro in spool.quarentena()] == [(1, True)]
+    assert spool.contar_pendentes() == 0
+
+
+def test_entrada_sozinha_que_falha_nao_e_culpada(spool, tmp_path):
+    backend = BackendSQLite(str(tmp_path / "respostas.db"))
+    spool.gravar(linhas_envio("ruim", bloco=None), "ruim")
+
+    fila = FilaEnvio(backend, spool, intervalo_s=0.1, backoff_base_s=0.05, max_falhas=2)
+    time.sleep(1)
+    fila.parar(timeout=5)
+
+    assert spool.quarentena() == []
+    assert spool.contar_pendentes() == 1
+
+
+def test_aba_inexistente_deixa_as_entradas_pendentes(spool):
+    gspread = pytest.importorskip("gspread")
+
+    def conectar():
+        raise gspread.exceptions.WorksheetNotFound("Fatores_Interpessoais")
+
+    backend = BackendSheets(ClienteSheets(conectar, max_tentativas=1, backoff_base_s=0.01))
+    for id_envio in ("a", "b", "c"):
+        spool.gravar(linhas_envio(id_envio), id_envio)
+
+    fila = FilaEnvio(backend, spool, intervalo_s=0.1, backoff_base_s=0.05, max_falhas=1)
+    time.sleep(1)
+    fila.parar(timeout=5)
+
+    assert spool.quarentena() == []
+    assert spool.contar_pendentes() == 3
+
+
+def test_parar_interrompe_o_backoff(spool):
+    class Indisponivel(BackendSQLite):
+        def gravar_linhas(self, linhas):
+            raise ConnectionError("sem rede")
+
+    spool.gravar(linhas_envio("a"), "a")
+    fila = FilaEnvio(Indisponivel(":memory:"), spool, intervalo_s=0.1, backoff_base_s=60.0)
+    time.sleep(0.5)  # a primeira janela falha e a fila entra no backoff de 60 s
+
+    inicio = time.monotonic()
+    fila.parar(timeout=5)
+    assert time.monotonic() - inicio < 2
+    assert spool.contar_pendentes() == 1
@@ -0,0 +1,87 @@
+# test_formato_compacto.py
+# Conversão longo <-> compacto: agrupamento por id_envio, linhas antigas sem
+# id_envio, item repetido na mesma chave, itens e instrumentos de fora e a volta
+# compacto -> longo com a pontuação dos reversos.
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from formato_compacto import SEM_RESPOSTA, compacto_para_longo, longo_para_compacto  # noqa: E402
+from instrumento import Instrumento, ItemInstrumento  # noqa: E402
+
+ITENS = (
+    ItemInstrumento(1, "Comunicação", "", "COM01", "Escuto os colegas", False),
+    ItemInstrumento(2, "Comunicação", "", "COM02", "Interrompo os colegas", True),
+    ItemInstrumento(3, "Liderança", "", "LID01", "Assumo a frente", False),
+)
+INSTRUMENTO = Instrumento("teste", "0", ITENS, ("Comunicação", "Liderança"),
+                          (("Comunicação", (0, 1)), ("Liderança", (2,))))
+
+
+def linha(item, resposta, id_envio=None, timestamp="2026-01-01T10:00:00", respondente="Ana",
+          instrumento="teste"):
+    fixas = [timestamp, "org", respondente, "2026-01-01", "Org"]
+    bloco = next(i.bloco for i in ITENS if i.texto == item)
+    longa = fixas + [bloco, item, resposta, resposta, instrumento]
+    return longa if id_envio is None else longa + [id_envio]
+
+
+def test_agrupa_por_id_envio():
+    compactas = longo_para_compacto(INSTRUMENTO, [
+        linha("Escuto os colegas", 5, "e1"),
+        linha("Escuto os colegas", 2, "e2"),
+        linha("Assumo a frente", 4, "e1"),
+    ])
+
+    assert compactas == [
+        ["2026-01-01T10:00:00", "org", "Ana", "2026-01-01", "Org", "e1", 5, SEM_RESPOSTA, 4],
+        ["2026-01-01T10:00:00", "org", "Ana", "2026-01-01", "Org", "e2", 2, SEM_RESPOSTA, SEM_RESPOSTA],
+    ]
+
+
+def test_linhas_antigas_sem_id_envio():
+    compactas = longo_para_compacto(INSTRUMENTO, [
+        linha("Escuto os colegas", 5),
+        linha("Interrompo os colegas", "N/A"),
+        linha("Escuto os colegas", 3, timestamp="2026-01-01T11:00:00"),
+    ])
+
+    assert [c[0] for c in compactas] == ["2026-01-01T10:00:00", "2026-01-01T11:00:00"]
+    assert [c[5:] for c in compactas] == [["", 5, SEM_RESPOSTA, SEM_RESPOSTA], ["", 3, SEM_RESPOSTA, SEM_RESPOSTA]]
+
+
+def test_item_repetido_na_mesma_chave_inicia_outra_submissao():
+    # Duas submissões anônimas no mesmo segundo: a chave antiga não as separa
+    compactas = longo_para_compacto(INSTRUMENTO, [
+        linha("Escuto os colegas", 5, respondente=""),
+        linha("Assumo a frente", 1, respondente=""),
+        linha("Escuto os colegas", 2, respondente=""),
+        linha("Assumo a frente", 3, respondente=""),
+    ])
+
+    assert [c[6:] for c in compactas] == [[5, SEM_RESPOSTA, 1], [2, SEM_RESPOSTA, 3]]
+
+
+def test_item_ou_instrumento_de_fora_levanta_erro():
+    with pytest.raises(ValueError, match="Item fora do instrumento"):
+        longo_para_compacto(INSTRUMENTO, [linha("Escuto os colegas", 5, "e1")[:6] + ["Outro item", 5, 5]])
+    with pytest.raises(ValueError, match="instrumento 'outro'"):
+        longo_para_compacto(INSTRUMENTO, [linha("Escuto os colegas", 5, "e1", instrumento="outro")])
+
+
+def test_ida_e_volta_pontua_os_reversos():
+    pytest.importorskip("numpy")
+    longas = [
+        linha("Escuto os colegas", 5, "e1"),
+        linha("Interrompo os colegas", 2, "e1"),
+        linha("Assumo a frente", "N/A", "e1"),
+    ]
+
+    volta = compacto_para_longo(INSTRUMENTO, longo_para_compacto(INSTRUMENTO, longas))
+
+    assert [v[:8] for v in volta] == [longa[:8] for longa in longas]
+    assert [v[8:] for v in volta] == [[5, "teste", "e1"], [4, "teste", "e1"], ["N/A", "teste", "e1"]]
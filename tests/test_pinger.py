@@ -0,0 +1,80 @@
+# test_pinger.py
+# Aquecimento contra um servidor Streamlit local (streamlit run), com um app
+# mínimo que registra cada execução do script num arquivo.
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pinger  # noqa: E402
+
+APP_MINIMO = """
+import streamlit as st
+with open({marcador!r}, "a") as f:
+    f.write("execucao\\n")
+st.write("ok")
+"""
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def servidor_streamlit(tmp_path):
+    pytest.importorskip("streamlit")
+    marcador = tmp_path / "execucoes.txt"
+    app = tmp_path / "app.py"
+    app.write_text(APP_MINIMO.format(marcador=str(marcador)), encoding="utf-8")
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(app),
+         "--server.port", str(porta), "--server.address", "127.0.0.1",
+         "--server.headless", "true", "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        yield f"http://127.0.0.1:{porta}/", marcador
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+
+def test_aquecer_abre_sessao_e_executa_o_script(servidor_streamlit):
+    url, marcador = servidor_streamlit
+    resultado = pinger.aquecer(url, timeout_total=60.0, intervalo=0.5)
+
+    assert resultado["servidor"] == url
+    assert resultado["script"] == "sucesso"
+    assert resultado["mensagens"] >= 2
+    assert marcador.read_text(encoding="utf-8").count("execucao") == 1
+
+
+def test_aquecer_sem_sessao_nao_executa_o_script(servidor_streamlit):
+    url, marcador = servidor_streamlit
+    resultado = pinger.aquecer(url, timeout_total=60.0, intervalo=0.5, sessao=False)
+
+    assert "script" not in resultado
+    assert not marcador.exists()
+
+
+def test_main_registra_erro_sem_falhar_por_padrao():
+    url = f"http://127.0.0.1:{_porta_livre()}/"
+    assert pinger.main(["--url", url, "--timeout", "1", "--intervalo", "0.2"]) == 0
+    assert pinger.main(["--url", url, "--timeout", "1", "--intervalo", "0.2", "--estrito"]) == 1
+
+
+@pytest.mark.parametrize("url, esperado", [
+    ("https://app-exemplo.streamlit.app/", "https://app-exemplo.streamlit.app/~/+/"),
+    ("https://app-exemplo.streamlit.app/~/+/", "https://app-exemplo.streamlit.app/~/+/"),
+    ("http://localhost:8501", "http://localhost:8501/"),
+])
+def test_url_do_servidor(url, esperado):
+    assert pinger.url_do_servidor(url) == esperado
@@ -0,0 +1,70 @@
+# test_pontuacao.py
+# Motor de pontuação: inversão dos reversos, máscara de N/A e médias por bloco
+# num lote (matriz N x itens), e a expansão compacto -> longo que o usa.
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+np = pytest.importorskip("numpy")
+
+from instrumento import Instrumento, ItemInstrumento  # noqa: E402
+from pontuacao import (IndiceItens, codificar_lote, linhas_para_planilha, medias_por_bloco,  # noqa: E402
+                       pontuar)
+
+ITENS = (
+    ItemInstrumento(1, "Comunicação", "", "COM01", "Escuto os colegas", False),
+    ItemInstrumento(2, "Comunicação", "", "COM02", "Interrompo os colegas", True),
+    ItemInstrumento(3, "Liderança", "", "LID01", "Assumo a frente", False),
+)
+INSTRUMENTO = Instrumento("teste", "0", ITENS, ("Comunicação", "Liderança"),
+                          (("Comunicação", (0, 1)), ("Liderança", (2,))))
+
+
+@pytest.fixture
+def indice():
+    return IndiceItens.de_instrumento(INSTRUMENTO)
+
+
+def test_pontuar_inverte_reversos_e_preserva_nan(indice):
+    lote = codificar_lote(indice, [
+        {"COM01": 5, "COM02": 1, "LID01": 2},
+        {"COM01": "N/A", "COM02": 4},
+    ])
+    pontos = pontuar(indice, lote)
+
+    assert lote.shape == (2, 3)
+    np.testing.assert_array_equal(pontos[0], [5, 5, 2])
+    assert np.isnan(pontos[1, 0]) and pontos[1, 1] == 2 and np.isnan(pontos[1, 2])
+
+
+def test_medias_por_bloco_num_lote(indice):
+    pontos = pontuar(indice, codificar_lote(indice, [
+        {"COM01": 5, "COM02": 1, "LID01": 2},
+        {"COM01": "N/A", "COM02": 4},
+    ]))
+    medias, contagens = medias_por_bloco(indice, pontos)
+
+    assert medias.shape == contagens.shape == (2, 2)
+    np.testing.assert_array_equal(contagens, [[2, 1], [1, 0]])
+    np.testing.assert_allclose(medias[0], [5.0, 2.0])
+    assert medias[1, 0] == 2.0 and np.isnan(medias[1, 1])
+
+
+def test_linhas_para_planilha_marca_na(indice):
+    linhas = linhas_para_planilha(indice, {"COM02": 2, "LID01": "N/A"}, ["t", "org"], ["teste", "id"])
+
+    assert [linha[4:6] for linha in linhas] == [["N/A", "N/A"], [2, 4], ["N/A", "N/A"]]
+    assert linhas[0][-2:] == ["teste", "id"]
+
+
+def test_compacto_para_longo_usa_o_motor(indice):
+    from formato_compacto import compacto_para_longo
+
+    linhas = compacto_para_longo(INSTRUMENTO, [["t", "org", "", "d", "Org", "id-1", "5", "1", "0"]])
+
+    assert [linha[7:9] for linha in linhas] == [[5, 5], [1, 5], ["N/A", "N/A"]]
+    assert {linha[10] for linha in linhas} == {"id-1"}
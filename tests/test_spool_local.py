@@ -0,0 +1,105 @@
+# test_spool_local.py
+# Spool local em SQLite: deduplicação por id_envio, quarentena e liberação,
+# migração de spools antigos e o reinício com entradas pendentes, em que a fila
+# confere no backend o que já foi gravado antes de reenviar.
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from armazenamento import BackendSQLite  # noqa: E402
+from fila_envio import FilaEnvio  # noqa: E402
+from spool_local import SpoolLocal  # noqa: E402
+
+
+def linhas_envio(id_envio, n=2):
+    return [["2026-01-01T10:00:00", "org", "", "2026-01-01", "Org", "Comunicação", f"Item {i}", "3", "3",
+             "fatores_interpessoais", id_envio] for i in range(n)]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = SpoolLocal(str(tmp_path / "spool.db"))
+    yield spool
+    spool.fechar()
+
+
+def test_id_envio_repetido_nao_e_gravado_de_novo(spool):
+    assert spool.gravar(linhas_envio("e1"), "e1") is not None
+    assert spool.gravar(linhas_envio("e1"), "e1") is None
+    assert spool.contem_envio("e1") and not spool.contem_envio("e2")
+    assert spool.contar_pendentes() == 2
+
+    # Sem id_envio (entradas antigas) não há deduplicação
+    spool.gravar(linhas_envio(""))
+    spool.gravar(linhas_envio(""))
+    assert spool.contar_pendentes() == 6
+
+
+def test_pendentes_respeita_max_linhas(spool):
+    for id_envio in ("e1", "e2", "e3"):
+        spool.gravar(linhas_envio(id_envio), id_envio)
+
+    assert [len(linhas) for _, linhas in spool.pendentes(max_linhas=5)] == [2, 2]
+    assert len(spool.pendentes(max_linhas=1)) == 1  # sempre ao menos uma entrada
+
+
+def test_quarentena_e_liberar(spool):
+    id_ruim = spool.gravar(linhas_envio("ruim"), "ruim")
+    spool.gravar(linhas_envio("ok"), "ok")
+
+    assert spool.registrar_falha(id_ruim, "linha malformada", max_falhas=2) is False
+    assert spool.registrar_falha(id_ruim, "linha malformada", max_falhas=2) is True
+    assert [(id_entrada, falhas, erro) for id_entrada, _, _, falhas, erro in spool.quarentena()] == \
+        [(id_ruim, 2, "linha malformada")]
+    assert [id_entrada for id_entrada, _ in spool.pendentes()] == [id_ruim + 1]
+    assert spool.contar_pendentes() == 2
+
+    spool.liberar([id_ruim])
+    assert spool.quarentena() == []
+    assert spool.contar_pendentes() == 4
+    # O contador de falhas recomeça do zero
+    assert spool.registrar_falha(id_ruim, "de novo", max_falhas=2) is False
+
+
+def test_spool_antigo_e_migrado(tmp_path):
+    caminho = str(tmp_path / "antigo.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute("CREATE TABLE entradas (id INTEGER PRIMARY KEY AUTOINCREMENT, recebido_em TEXT NOT NULL, "
+                 "n_linhas INTEGER NOT NULL, linhas TEXT NOT NULL, confirmado_em TEXT)")
+    conn.execute("INSERT INTO entradas (recebido_em, n_linhas, linhas) VALUES ('2026-01-01', 1, '[[1]]')")
+    conn.commit()
+    conn.close()
+
+    spool = SpoolLocal(caminho)
+    assert spool.gravar(linhas_envio("e1"), "e1") is not None
+    assert spool.gravar(linhas_envio("e1"), "e1") is None
+    assert [linhas for _, linhas in spool.pendentes()][0] == [[1]]
+    spool.fechar()
+
+
+def test_reinicio_confere_o_backend_antes_de_reenviar(tmp_path):
+    caminho = str(tmp_path / "spool.db")
+    backend = BackendSQLite(str(tmp_path / "respostas.db"))
+    spool = SpoolLocal(caminho)
+    spool.gravar(linhas_envio("e1"), "e1")
+    spool.gravar(linhas_envio("e2"), "e2")
+    # O processo anterior gravou e1 no backend e caiu antes de confirmar no spool
+    backend.gravar_linhas(linhas_envio("e1"))
+    spool.fechar()
+
+    spool = SpoolLocal(caminho)
+    fila = FilaEnvio(backend, spool, intervalo_s=60.0)
+    limite = time.monotonic() + 10
+    while spool.contar_pendentes() and time.monotonic() < limite:
+        time.sleep(0.05)
+    fila.parar(timeout=5)
+
+    assert spool.contar_pendentes() == 0
+    assert [linha[10] for linha in backend.ler_linhas_desde(0)] == ["e1", "e1", "e2", "e2"]
+    spool.fechar()